@@ -0,0 +1,340 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema.messages import HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from gemini_rest import GeminiRestModel, PromptChain, image_part, text_part
+from inference_client import InferenceClient
+from rate_limit import SKIPPED, FairLimiter
+
+logger = logging.getLogger(__name__)
+
+
+SYSTEM_PROMPT = """You are a multi-purpose detection assistant. Analyze the provided image and respond accordingly."""
+
+BATCH_INSTRUCTIONS = """You will receive {count} images, each preceded by its number and a question about it.
+Answer each question independently, using only its own image.
+Respond with only a JSON array of {count} objects of the form {{"image": <number>, "answer": "<answer>"}}."""
+
+
+def build_batch_messages(requests):
+    """One multimodal message asking each request's question about its own image."""
+    content = [{"type": "text", "text": BATCH_INSTRUCTIONS.format(count=len(requests))}]
+    for number, request in enumerate(requests, start=1):
+        content.append({"type": "text", "text": f"Image {number}: {request.prompt}"})
+        content.append({"type": "image_url", "image_url": f"data:image/jpeg;base64,{request.image}"})
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=content)]
+
+
+def parse_batch_response(text: str, count: int):
+    """Map a batched JSON answer back to one answer (or error string) per image."""
+    try:
+        # Models often wrap JSON in a code fence, so take the outermost array
+        items = json.loads(text[text.find("["):text.rfind("]") + 1])
+        answers = {int(item["image"]): str(item["answer"]).strip() for item in items}
+    except (ValueError, TypeError, KeyError) as e:
+        return [f"Error: unparseable batch response ({e})"] * count
+    return [answers.get(number, "Error: no answer for image in batch") for number in range(1, count + 1)]
+
+
+class RestBatchChain:
+    """The batched question as one Gemini REST call: ainvoke(requests) returns the JSON answer text."""
+
+    def __init__(self, model: GeminiRestModel):
+        self.model = model
+
+    async def ainvoke(self, requests) -> str:
+        parts = [text_part(BATCH_INSTRUCTIONS.format(count=len(requests)))]
+        for number, request in enumerate(requests, start=1):
+            parts += [text_part(f"Image {number}: {request.prompt}"), image_part(request.image)]
+        return await self.model.generate(parts, SYSTEM_PROMPT)
+
+
+class BatchRequest:
+    """One queued question; its future is cancelled when the caller stops waiting."""
+
+    def __init__(self, image, prompt, model_type, camera_id):
+        self.image = image
+        self.prompt = prompt
+        self.model_type = model_type
+        self.camera_id = camera_id
+        self.future = Future()
+
+
+class RequestBatcher:
+    """Packs queued requests from several cameras into one multimodal call.
+
+    Members are taken round-robin by camera; cancelled requests are dropped and at most max_queue wait.
+    """
+
+    def __init__(self, client: InferenceClient, batch_chain, single_chains, limiter: FairLimiter, max_batch: int,
+                 max_wait: float, max_queue: int = 64):
+        self.client = client
+        self.batch_chain = batch_chain  # ainvoke(list of BatchRequest) -> JSON answer text
+        self.single_chains = single_chains  # model_type -> chain, for batches of one
+        self.limiter = limiter
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.pending = {}  # camera_id -> deque of requests
+        self.order = deque()  # Cameras with queued requests, next turn first
+        self.queued = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, request: BatchRequest) -> Future:
+        skipped = None
+        with self._cond:
+            pending = self.pending.get(request.camera_id)
+            if self.queued >= self.max_queue:
+                if pending:
+                    # Full: the camera's newer frame replaces its oldest queued one
+                    skipped = pending.popleft()
+                    self.queued -= 1
+                else:
+                    skipped = request
+                self.dropped += 1
+            if skipped is not request:
+                if pending is None:
+                    pending = self.pending[request.camera_id] = deque()
+                    self.order.append(request.camera_id)
+                pending.append(request)
+                self.queued += 1
+                self._cond.notify()
+        if skipped and skipped.future.set_running_or_notify_cancel():
+            skipped.future.set_result(SKIPPED)
+        return request.future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.queued:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.max_wait
+                while self.queued < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take()
+            if batch:
+                self._dispatch(batch)
+
+    def _take(self):
+        """Pop up to max_batch live requests, one camera at a time."""
+        batch = []
+        while self.order and len(batch) < self.max_batch:
+            camera_id = self.order.popleft()
+            pending = self.pending[camera_id]
+            request = pending.popleft()
+            self.queued -= 1
+            if pending:
+                self.order.append(camera_id)
+            else:
+                del self.pending[camera_id]
+            # Marks the future running, so a caller giving up from here on no longer cancels it
+            if request.future.set_running_or_notify_cancel():
+                batch.append(request)
+            else:
+                self.cancelled += 1
+        return batch
+
+    def _dispatch(self, batch):
+        if not self.limiter.acquire("batch"):
+            for request in batch:
+                request.future.set_result(SKIPPED)
+            return
+
+        if len(batch) == 1:
+            request = batch[0]
+            call = self.client.submit(self.single_chains[request.model_type],
+                                      {"prompt": request.prompt, "image_base64": request.image})
+        else:
+            call = self.client.submit(self.batch_chain, batch)
+        self.batches += 1
+        self.batched_requests += len(batch)
+        # Fan out when the call finishes, so this thread can collect the next batch meanwhile
+        call.add_done_callback(lambda done: self._resolve(batch, done))
+
+    def _resolve(self, batch, done: Future):
+        try:
+            text = done.result()
+            answers = [text.strip()] if len(batch) == 1 else parse_batch_response(text, len(batch))
+        except Exception as e:
+            answers = [f"Error: {str(e)}"] * len(batch)
+
+        for request, answer in zip(batch, answers):
+            request.future.set_result(answer)
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'requests': self.batched_requests,
+            'avg_batch_size': round(self.batched_requests / self.batches, 2) if self.batches else None,
+            'queued': self.queued,
+            'dropped': self.dropped,
+            'cancelled': self.cancelled,
+        }
+
+
+class Assistant:
+    """Gemini-backed fire and helmet checks, rate limited per API key.
+
+    Models can be passed in (e.g. a fake chat model in tests); otherwise they
+    are REST clients for GOOGLE_API_KEY_FIRE / GOOGLE_API_KEY_HELMET, talking
+    to GEMINI_API_ENDPOINT when set (e.g. fake_gemini_server.py). Models
+    sharing an API key share a limiter, since the quota is per key. All
+    calls go through one InferenceClient.
+    """
+
+    def __init__(self, fire_model=None, helmet_model=None, rate: float = None,
+                 burst: float = None, max_wait: float = None, max_batch: int = None,
+                 batch_wait: float = None, max_concurrency: int = None, deadline: float = None,
+                 max_queue: int = None):
+        max_concurrency = max_concurrency if max_concurrency is not None else int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+        deadline = deadline if deadline is not None else float(os.getenv("GEMINI_DEADLINE", "5"))
+        self.client = InferenceClient(max_concurrency, deadline)
+
+        keys = {
+            'fire': os.getenv("GOOGLE_API_KEY_FIRE"),
+            'helmet': os.getenv("GOOGLE_API_KEY_HELMET"),
+        }
+        if fire_model is None and helmet_model is None:
+            fire_model = self._initialize_model(keys['fire'], deadline)
+            helmet_model = self._initialize_model(keys['helmet'], deadline)
+        else:
+            # Injected models get one limiter each
+            keys = {'fire': 'fire', 'helmet': 'helmet'}
+
+        self.fire_model = fire_model
+        self.helmet_model = helmet_model
+        self.fire_chain = self._create_inference_chain(self.fire_model) if self.fire_model else None
+        self.helmet_chain = self._create_inference_chain(self.helmet_model) if self.helmet_model else None
+
+        rate = rate if rate is not None else float(os.getenv("GEMINI_RATE_PER_KEY", "2"))
+        burst = burst if burst is not None else float(os.getenv("GEMINI_BURST_PER_KEY", "4"))
+        max_wait = max_wait if max_wait is not None else float(os.getenv("GEMINI_MAX_WAIT", "1"))
+        self.limiters = {}
+        self.model_limiters = {}
+        for model_type, key in keys.items():
+            if key not in self.limiters:
+                self.limiters[key] = FairLimiter(rate, burst, max_wait)
+            self.model_limiters[model_type] = self.limiters[key]
+
+        # Batching packs requests for models sharing an API key into one call
+        max_batch = max_batch if max_batch is not None else int(os.getenv("GEMINI_MAX_BATCH", "1"))
+        batch_wait = batch_wait if batch_wait is not None else float(os.getenv("GEMINI_BATCH_WAIT", "0.2"))
+        max_queue = max_queue if max_queue is not None else int(os.getenv("GEMINI_BATCH_MAX_QUEUE", "64"))
+        self.batchers = {}
+        if max_batch > 1:
+            chains = {'fire': self.fire_chain, 'helmet': self.helmet_chain}
+            models = {'fire': self.fire_model, 'helmet': self.helmet_model}
+            by_key = {}
+            for model_type, key in keys.items():
+                if models[model_type]:
+                    by_key.setdefault(key, []).append(model_type)
+            for key, model_types in by_key.items():
+                batcher = RequestBatcher(self.client, self._create_batch_chain(models[model_types[0]]), chains, self.limiters[key],
+                                         max_batch, batch_wait, max_queue)
+                for model_type in model_types:
+                    self.batchers[model_type] = batcher
+        self.request_timeout = max_wait + batch_wait + deadline
+
+    def _initialize_model(self, api_key, timeout):
+        # Plain REST rather than ChatGoogleGenerativeAI: its async calls always
+        # use gRPC, which GEMINI_API_ENDPOINT fakes cannot answer
+        if not api_key:
+            logger.error("Model initialization error: no API key")
+            return None
+        return GeminiRestModel(
+            api_key,
+            model="gemini-1.5-flash-latest",
+            endpoint=os.getenv("GEMINI_API_ENDPOINT"),
+            temperature=0.1,
+            timeout=timeout,
+        )
+
+    def submit(self, image, prompt, model_type, camera_id=None) -> Future:
+        """Queue a request and return a future for its raw result.
+
+        Waits for a rate-limit token first (up to max_wait), so the future
+        may already hold SKIPPED or a setup error string.
+        """
+        if model_type == "fire":
+            chain = self.fire_chain
+        elif model_type == "helmet":
+            chain = self.helmet_chain
+        else:
+            return _resolved("Invalid model type")
+
+        if not chain:
+            return _resolved("Model not initialized")
+
+        batcher = self.batchers.get(model_type)
+        if batcher:
+            return batcher.submit(BatchRequest(image, prompt, model_type, camera_id))
+
+        if not self.model_limiters[model_type].acquire(camera_id):
+            return _resolved(SKIPPED)
+        return self.client.submit(chain, {"prompt": prompt, "image_base64": image})
+
+    def answer(self, image, prompt, model_type, camera_id=None):
+        """Return the model's verdict, an error string, or SKIPPED if rate limited.
+
+        A missed deadline is an error, not SKIPPED: the request was sent, and
+        callers such as the fire check fall back to a local verdict on errors.
+        """
+        future = self.submit(image, prompt, model_type, camera_id)
+        try:
+            response = future.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            # Drops the request if it is still queued for a batch
+            future.cancel()
+            return f"Error: no response within {self.request_timeout}s"
+        except Exception as e:
+            return f"Error: {str(e)}"
+        return response if response is SKIPPED else response.strip()
+
+    def stats(self) -> dict:
+        stats = {model_type: limiter.stats() for model_type, limiter in self.model_limiters.items()}
+        for model_type, batcher in self.batchers.items():
+            stats[model_type]['batching'] = batcher.stats()
+        stats['client'] = self.client.stats()
+        return stats
+
+    def _create_inference_chain(self, model):
+        # Every check is a single stateless question, so there is no message history
+        if isinstance(model, GeminiRestModel):
+            return PromptChain(model, SYSTEM_PROMPT)
+        prompt_template = ChatPromptTemplate.from_messages([
+            SystemMessage(content=SYSTEM_PROMPT),
+            ("human", [
+                {"type": "text", "text": "{prompt}"},
+                {"type": "image_url", "image_url": "data:image/jpeg;base64,{image_base64}"},
+            ]),
+        ])
+        return prompt_template | model | StrOutputParser()
+
+    def _create_batch_chain(self, model):
+        if isinstance(model, GeminiRestModel):
+            return RestBatchChain(model)
+        return RunnableLambda(build_batch_messages) | model | StrOutputParser()
+
+
+def _resolved(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
@@ -0,0 +1,212 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import face_recognition
+
+from face_detection import FaceDetector
+from face_index import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment the parent owns and unlinks."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Spawned workers share the parent's resource tracker, so registering again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+# Worker-process state: attached frame segments, detectors and the local gallery copy
+_segments: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+_detectors = {}
+_gallery = {'version': None, 'store': None}
+_MAX_SEGMENTS = 64
+
+
+def _frame(name: str, shape):
+    shm = _segments.get(name)
+    if shm is None:
+        shm = _segments[name] = _attach(name)
+        while len(_segments) > _MAX_SEGMENTS:
+            _segments.popitem(last=False)[1].close()
+    _segments.move_to_end(name)
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def _detect_task(name: str, shape, options: dict):
+    started = time.process_time()
+    key = tuple(sorted(options.items()))
+    if key not in _detectors:
+        _detectors[key] = FaceDetector(**options)
+    return _detectors[key].detect(_frame(name, shape)), time.process_time() - started
+
+
+def _match_task(name: str, shape, boxes, gallery):
+    started = time.process_time()
+    version, gallery_name, rows = gallery
+    if _gallery['version'] != version:
+        # Copy the published matrix into worker memory once per gallery version
+        shm = _attach(gallery_name)
+        matrix = np.ndarray((rows, 128), dtype=np.float32, buffer=shm.buf).copy()
+        shm.close()
+        _gallery['store'] = EmbeddingStore(np.arange(rows), [''] * rows, matrix)
+        _gallery['version'] = version
+
+    encodings = face_recognition.face_encodings(_frame(name, shape), boxes)
+    distances, indices = _gallery['store'].search(encodings, k=1)
+    results = [
+        (int(i[0]), float(d[0])) if len(i) else None
+        for d, i in zip(distances, indices)
+    ]
+    return results, time.process_time() - started
+
+
+class LocalFrame:
+    """Runs detection and matching in the calling thread; the default backend."""
+
+    def __init__(self, rgb_frame):
+        self.rgb_frame = rgb_frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def detect(self, detector: FaceDetector):
+        return detector.detect(self.rgb_frame)
+
+    def match(self, boxes, matcher, threshold: float):
+        return matcher.match(face_recognition.face_encodings(self.rgb_frame, boxes), threshold=threshold)
+
+
+class SharedFrame:
+    """A frame copied into a shared-memory slot, processed by pool workers."""
+
+    def __init__(self, pool: "AttendancePool", slot: shared_memory.SharedMemory, shape):
+        self.pool = pool
+        self.slot = slot
+        self.shape = shape
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.pool._release(self.slot)
+        return False
+
+    def detect(self, detector: FaceDetector):
+        boxes, cpu_seconds = self.pool.executor.submit(
+            _detect_task, self.slot.name, self.shape, detector.options()
+        ).result()
+        self.pool._charge(cpu_seconds)
+        return boxes
+
+    def match(self, boxes, matcher, threshold: float):
+        if not boxes:
+            return []
+        gallery, ids, names = self.pool._publish(matcher)
+        results, cpu_seconds = self.pool.executor.submit(
+            _match_task, self.slot.name, self.shape, boxes, gallery
+        ).result()
+        self.pool._charge(cpu_seconds)
+
+        matches = []
+        for result in results:
+            if result is None or result[1] >= threshold:
+                matches.append([])
+                continue
+            row, distance = result
+            matches.append([{'employee_id': ids[row], 'name': names[row], 'distance': distance}])
+        return matches
+
+
+class AttendancePool:
+    """Worker processes for attendance face detection and encoding, fed frames via shared memory.
+
+    Their CPU time is credited to the submitting thread; see offloaded_cpu_time().
+    """
+
+    def __init__(self, workers: int, slots: int = None):
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')  # Never fork a process full of threads
+        )
+        self.free_slots: queue.Queue = queue.Queue()
+        for _ in range(slots or 2 * workers):
+            self.free_slots.put(None)  # Segments are allocated on first use, sized to the frame
+        self.galleries = []  # Recent (matcher, (version, name, rows), ids, names, shm), newest last
+        self._version = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def frame(self, rgb_frame) -> SharedFrame:
+        """Copy rgb_frame into a free slot, blocking while all slots are in use."""
+        slot = self.free_slots.get()
+        if slot is None or slot.size < rgb_frame.nbytes:
+            if slot is not None:
+                slot.close()
+                slot.unlink()
+            slot = shared_memory.SharedMemory(create=True, size=rgb_frame.nbytes)
+        np.ndarray(rgb_frame.shape, dtype=np.uint8, buffer=slot.buf)[:] = rgb_frame
+        return SharedFrame(self, slot, rgb_frame.shape)
+
+    def _charge(self, cpu_seconds: float):
+        self._local.cpu_seconds = self.offloaded_cpu_time() + cpu_seconds
+
+    def offloaded_cpu_time(self) -> float:
+        """Worker CPU seconds spent on tasks submitted by the calling thread so far."""
+        return getattr(self._local, 'cpu_seconds', 0.0)
+
+    def _release(self, slot):
+        self.free_slots.put(slot)
+
+    def _publish(self, matcher):
+        with self._lock:
+            for published, gallery, ids, names, _ in self.galleries:
+                if published is matcher:
+                    return gallery, ids, names
+
+            # Only live rows are shipped; IVFIndex keeps freed slots in its matrix
+            alive = getattr(matcher, 'alive', None)
+            rows = np.flatnonzero(alive) if alive is not None else np.arange(len(matcher.ids))
+            matrix = np.ascontiguousarray(matcher.matrix[rows], dtype=np.float32)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+            np.ndarray(matrix.shape, dtype=np.float32, buffer=shm.buf)[:] = matrix
+
+            self._version += 1
+            gallery = (self._version, shm.name, len(rows))
+            self.galleries.append((matcher, gallery, matcher.ids[rows], matcher.names[rows], shm))
+
+            # Keep the previous version around for tasks that were already submitted
+            while len(self.galleries) > 2:
+                old_shm = self.galleries.pop(0)[4]
+                old_shm.close()
+                old_shm.unlink()
+            logger.info(f"Published {len(rows)} employee encodings to attendance workers")
+            return gallery, self.galleries[-1][2], self.galleries[-1][3]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        while True:
+            try:
+                slot = self.free_slots.get_nowait()
+            except queue.Empty:
+                break
+            if slot is not None:
+                slot.close()
+                slot.unlink()
+        with self._lock:
+            for *_, shm in self.galleries:
+                shm.close()
+                shm.unlink()
+            self.galleries = []
@@ -0,0 +1,58 @@
+"""Compare face detection settings on real frames: ms/frame and recall.
+
+Recall is measured against full-resolution HOG, the detector
+process_attendance used before detection became configurable.
+
+Usage: python benchmark_face_detection.py frames/ --settings hog:1.0 hog:0.5 hog:0.25 ssd
+       python benchmark_face_detection.py clip.mp4 --max-frames 200
+"""
+import argparse
+import time
+
+from benchmark_frames import load_frames
+from face_detection import FaceDetector
+from face_tracker import box_iou
+
+
+def parse_setting(setting: str) -> dict:
+    method, _, scale = setting.partition(':')
+    return {'method': method, 'scale': float(scale or 1.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help="Directory of images or a video file / RTSP URL")
+    parser.add_argument('--settings', nargs='+', default=['hog:1.0', 'hog:0.5', 'hog:0.25', 'ssd'])
+    parser.add_argument('--max-frames', type=int, default=100)
+    parser.add_argument('--stride', type=int, default=5, help="Use every Nth video frame")
+    parser.add_argument('--iou', type=float, default=0.3,
+                        help="Min IoU to count as the same face; SSD boxes are looser than HOG's")
+    args = parser.parse_args()
+
+    frames = list(load_frames(args.source, args.max_frames, args.stride, rgb=True))
+    if not frames:
+        parser.error(f"No frames read from {args.source}")
+
+    reference = FaceDetector('hog', 1.0)
+    truth = [reference.detect(frame) for frame in frames]
+    total = sum(len(boxes) for boxes in truth)
+    height, width = frames[0].shape[:2]
+    print(f"frames={len(frames)} resolution={width}x{height} reference faces={total}")
+    print(f"{'setting':<12}{'ms/frame':>10}{'faces':>8}{'recall':>8}")
+
+    for setting in args.settings:
+        detector = FaceDetector(**parse_setting(setting))
+        detector.detect(frames[0])  # Warm up
+        found = matched = 0
+        start = time.perf_counter()
+        results = [detector.detect(frame) for frame in frames]
+        elapsed = time.perf_counter() - start
+        for boxes, expected in zip(results, truth):
+            found += len(boxes)
+            matched += sum(1 for t in expected if any(box_iou(t, b) >= args.iou for b in boxes))
+        recall = matched / total if total else float('nan')
+        print(f"{setting:<12}{elapsed * 1000 / len(frames):>10.1f}{found:>8}{recall:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare exact and IVF face matching on a synthetic 128-d gallery.
+
+Usage: python benchmark_face_index.py --gallery 50000 --queries 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from face_index import EmbeddingStore, IVFIndex
+
+
+def synthetic_gallery(size: int, seed: int = 0) -> np.ndarray:
+    # Real dlib encodings sit roughly 0.8-1.0 apart between people; scale to match
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(size, 128)) * 0.065).astype(np.float32)
+
+
+def timed_search(matcher, queries, faces_per_frame, **kwargs):
+    # Search in frame-sized batches, the way process_attendance calls the matcher
+    hits = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), faces_per_frame):
+        _, indices = matcher.search(queries[i:i + faces_per_frame], k=1, **kwargs)
+        hits.append(indices[:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(hits), elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gallery', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--faces-per-frame', type=int, default=4)
+    parser.add_argument('--noise', type=float, default=0.02, help="Per-dimension std of query noise")
+    parser.add_argument('--n-lists', type=int, default=None)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    gallery = synthetic_gallery(args.gallery)
+    ids = np.arange(args.gallery)
+    names = [str(i) for i in ids]
+    rng = np.random.default_rng(1)
+    truth = rng.choice(args.gallery, args.queries, replace=False)
+    queries = gallery[truth] + rng.normal(scale=args.noise, size=(args.queries, 128)).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = EmbeddingStore(ids, names, gallery)
+    exact_build = time.perf_counter() - start
+    exact_hits, exact_ms = timed_search(exact, queries, args.faces_per_frame)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(ids, names, gallery, n_lists=args.n_lists)
+    ivf_build = time.perf_counter() - start
+
+    print(f"gallery={args.gallery} queries={args.queries} lists={len(ivf.centroids)}")
+    print(f"{'matcher':<16}{'build s':>10}{'ms/query':>12}{'recall@1':>12}")
+    print(f"{'exact':<16}{exact_build:>10.2f}{exact_ms:>12.3f}{1.0:>12.3f}")
+    for n_probe in args.n_probe:
+        hits, ms = timed_search(ivf, queries, args.faces_per_frame, n_probe=n_probe)
+        recall = float(np.mean(hits == exact_hits))
+        build = ivf_build if n_probe == args.n_probe[0] else 0.0
+        print(f"{f'ivf probe={n_probe}':<16}{build:>10.2f}{ms:>12.3f}{recall:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
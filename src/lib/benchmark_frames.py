@@ -0,0 +1,31 @@
+import os
+
+import cv2
+
+
+def load_frames(source: str, max_frames: int, stride: int, rgb: bool = False):
+    """Yield frames from a directory of images or a video file, BGR unless rgb is set."""
+    count = 0
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            image = cv2.imread(os.path.join(source, name))
+            if image is None:
+                continue
+            yield cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if rgb else image
+            count += 1
+            if count >= max_frames:
+                return
+        return
+
+    cap = cv2.VideoCapture(source)
+    index = 0
+    while count < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        index += 1
+        if index % stride:
+            continue
+        yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if rgb else frame
+        count += 1
+    cap.release()
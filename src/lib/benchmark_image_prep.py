@@ -0,0 +1,80 @@
+"""Compare Assistant image preparation settings: payload bytes, encode time and latency.
+
+Settings are max_side:quality[:max_bytes], with max_side 0 meaning full
+resolution. With --live, every frame is also sent to Gemini through
+Assistant (GOOGLE_API_KEY_FIRE / GOOGLE_API_KEY_HELMET must be set), and
+the end-to-end latency and answers are reported per setting.
+
+Usage: python benchmark_image_prep.py frames/ --settings 0:95 1024:80 640:70 1024:85:60000
+       python benchmark_image_prep.py clip.mp4 --live --model helmet --max-frames 20
+"""
+import argparse
+import time
+from collections import Counter
+
+from benchmark_frames import load_frames
+from image_prep import ImagePrep
+
+
+def parse_setting(setting: str, roi) -> ImagePrep:
+    parts = [int(p) for p in setting.split(':')]
+    max_side, quality = parts[0] or None, parts[1] if len(parts) > 1 else 80
+    max_bytes = parts[2] if len(parts) > 2 else None
+    return ImagePrep(max_side=max_side, quality=quality, roi=roi, max_bytes=max_bytes,
+                     min_quality=min(30, quality))
+
+
+PROMPTS = {
+    'fire': "Detect if there is a fire. Respond with 'Fire detected' or 'No fire detected'.",
+    'helmet': "Detect if a person is wearing a helmet. Respond with 'Helmet detected' or 'No helmet detected'.",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help="Directory of images or a video file / RTSP URL")
+    parser.add_argument('--settings', nargs='+', default=['0:95', '1280:80', '1024:80', '640:70', '1024:85:60000'])
+    parser.add_argument('--roi', help="Crop as x,y,width,height fractions, e.g. 0.25,0,0.5,1")
+    parser.add_argument('--max-frames', type=int, default=50)
+    parser.add_argument('--stride', type=int, default=5, help="Use every Nth video frame")
+    parser.add_argument('--live', action='store_true', help="Also time real Gemini requests")
+    parser.add_argument('--model', choices=sorted(PROMPTS), default='fire')
+    args = parser.parse_args()
+
+    frames = list(load_frames(args.source, args.max_frames, args.stride))
+    if not frames:
+        parser.error(f"No frames read from {args.source}")
+    roi = [float(v) for v in args.roi.split(',')] if args.roi else None
+
+    assistant = None
+    if args.live:
+        from assistant import Assistant  # Only needed, and only importable, with the langchain stack
+        assistant = Assistant(rate=1000, burst=1000)
+
+    height, width = frames[0].shape[:2]
+    print(f"frames={len(frames)} resolution={width}x{height} live={args.live}")
+    print(f"{'setting':<18}{'KB/frame':>10}{'quality':>9}{'encode ms':>11}{'latency ms':>12}  answers")
+
+    for setting in args.settings:
+        prep = parse_setting(setting, roi)
+        prep.prepare(frames[0])  # Warm up
+        sizes, qualities, encode_times, latencies = [], [], [], []
+        answers = Counter()
+        for frame in frames:
+            start = time.perf_counter()
+            payload = prep.prepare(frame)
+            encode_times.append(time.perf_counter() - start)
+            sizes.append(prep.last_bytes)
+            qualities.append(prep.last_quality)
+            if assistant:
+                response = assistant.answer(payload, PROMPTS[args.model], args.model)
+                latencies.append(time.perf_counter() - start)
+                answers[str(response)[:30]] += 1
+
+        latency = f"{sum(latencies) * 1000 / len(latencies):.0f}" if latencies else '-'
+        print(f"{setting:<18}{sum(sizes) / len(sizes) / 1024:>10.1f}{sum(qualities) / len(qualities):>9.0f}"
+              f"{sum(encode_times) * 1000 / len(frames):>11.1f}{latency:>12}  {dict(answers) or ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,24 +8,27 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
 import numpy as np
-import base64
 import logging
-import mediapipe as mp
 from datetime import datetime, time
 import time
 from urllib.parse import unquote
-from sklearn.metrics.pairwise import cosine_similarity
 import face_recognition
-import pickle
-import assistant
-import tensorflow as tf
+from assistant import Assistant, SKIPPED
+from db_writer import SupabaseWriter
+import face_codec
+from face_detection import FaceDetector
+from face_tracker import FaceTracker
+from attendance_pool import AttendancePool, LocalFrame
+from motion_gate import MotionGate
+from inference_pipeline import FrameScheduler, InferencePipeline
+from result_cache import PerceptualCache, dhash
+from presence_tracker import PresenceTracker
+from employee_cache import EmployeeCache
+from fire_screen import FireScreen
+from image_prep import ImagePrep
+from metadata_cache import MetadataCache
+from stream_server import StreamHub, create_asgi_app
 from flask_cors import CORS
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema.messages import SystemMessage
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_google_genai import ChatGoogleGenerativeAI
 import queue
 from functools import lru_cache
 import warnings
@@ -43,164 +46,390 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase client with environment variables
-supabase_url = os.getenv("VITE_SUPABASE_URL")
-supabase_key = os.getenv("VITE_SUPABASE_ANON_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
-
-# Initialize MediaPipe Hands for gesture detection
-mp_hands = mp.solutions.hands
-hands_processor = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=2,
-    model_complexity=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5
-)
+# Clients, threads and pools are built by create_app(), not at import time:
+# spawned attendance workers re-import this module as __mp_main__
+supabase: Client = None
+# Batches detection and attendance rows off the inference threads
+db_writer: SupabaseWriter = None
+# MediaPipe Hands for gesture detection; imported in create_app() since it is slow to load
+mp_hands = None
 
-# Global state to track active models
-active_models = {}
+class HandsPool:
+    """Long-lived MediaPipe Hands graphs, one per camera, used only by that camera's inference thread.
 
-def fix_base64_padding(encoded_str: str) -> str:
-    """Add padding to base64 string if needed."""
-    padding = len(encoded_str) % 4
-    if padding:
-        encoded_str += '=' * (4 - padding)
-    return encoded_str
+    tracking=True runs in video mode and reuses landmarks between frames.
+    """
 
-def safe_base64_decode(encoded_str: str) -> bytes:
-    """Safely decode base64 string with padding correction."""
-    try:
-        # First try direct decoding
-        return base64.b64decode(encoded_str)
-    except Exception:
-        try:
-            # Try with padding correction
-            padded_str = fix_base64_padding(encoded_str)
-            return base64.b64decode(padded_str)
-        except Exception as e:
-            logger.error(f"Failed to decode base64 string: {str(e)}")
-            raise
-
-class Assistant:
-    def __init__(self):
-        self.fire_model = self._initialize_model(os.getenv("GOOGLE_API_KEY_FIRE"))
-        self.helmet_model = self._initialize_model(os.getenv("GOOGLE_API_KEY_HELMET"))
-        self.fire_chain = self._create_inference_chain(self.fire_model) if self.fire_model else None
-        self.helmet_chain = self._create_inference_chain(self.helmet_model) if self.helmet_model else None
-        self.last_inference_time = 0
-        self.inference_cooldown = 0.5
-
-    def _initialize_model(self, api_key):
-        try:
-            return ChatGoogleGenerativeAI(
-                google_api_key=api_key,
-                model="gemini-1.5-flash-latest",
-                temperature=0.1,
-                timeout=2
-            )
-        except Exception as e:
-            app.logger.error(f"Model initialization error: {e}")
-            return None
-
-    def answer(self, image, prompt, model_type):
-        if model_type == "fire":
-            chain = self.fire_chain
-        elif model_type == "helmet":
-            chain = self.helmet_chain
-        else:
-            return "Invalid model type"
+    def __init__(self, tracking: bool = False):
+        self.tracking = tracking
+        self.processors: Dict[str, object] = {}
+        self._lock = threading.Lock()
 
-        if not chain:
-            return "Model not initialized"
+    def get(self, camera_id: str):
+        with self._lock:
+            if camera_id not in self.processors:
+                self.processors[camera_id] = mp_hands.Hands(
+                    static_image_mode=not self.tracking,
+                    max_num_hands=2,
+                    min_detection_confidence=0.7,
+                    min_tracking_confidence=0.5,
+                    model_complexity=1
+                )
+            return self.processors[camera_id]
 
-        current_time = time.time()
-        if current_time - self.last_inference_time < self.inference_cooldown:
-            return None
+    def release(self, camera_id: str):
+        with self._lock:
+            hands = self.processors.pop(camera_id, None)
+        if hands:
+            hands.close()
 
-        try:
-            response = chain.invoke(
-                {"prompt": prompt, "image_base64": image},
-                config={"configurable": {"session_id": "unused"}},
-            ).strip()
-            self.last_inference_time = current_time
-            return response
-        except Exception as e:
-            return f"Error: {str(e)}"
-
-    def _create_inference_chain(self, model):
-        SYSTEM_PROMPT = """You are a multi-purpose detection assistant. Analyze the provided image and respond accordingly."""
-
-        prompt_template = ChatPromptTemplate.from_messages([
-            SystemMessage(content=SYSTEM_PROMPT),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", [
-                {"type": "text", "text": "{prompt}"},
-                {"type": "image_url", "image_url": "data:image/jpeg;base64,{image_base64}"},
-            ]),
-        ])
-
-        chain = prompt_template | model | StrOutputParser()
-        return RunnableWithMessageHistory(
-            chain,
-            lambda _: ChatMessageHistory(),
-            input_messages_key="prompt",
-            history_messages_key="chat_history",
-        )
-
-# Initialize the assistant globally
-assistant = Assistant()
+    def close_all(self):
+        with self._lock:
+            processors, self.processors = self.processors, {}
+        for hands in processors.values():
+            hands.close()
+
+hands_pool = HandsPool(tracking=os.getenv("HANDS_TRACKING_MODE", "false").lower() == "true")
+
+# Global state to track active models
+active_models = {}
+# Last inference thread per camera; a restart waits for it so two workers never share per-camera state
+model_workers: Dict[str, threading.Thread] = {}
+MODEL_STOP_TIMEOUT = float(os.getenv("MODEL_STOP_TIMEOUT", "10"))
+
+assistant: Assistant = None
 
 class CameraManager:
-    def __init__(self):
+    """Owns one RTSP connection and one reader thread per camera.
+
+    The reader decodes every frame exactly once and publishes it to each
+    subscriber's single-slot queue, so a slow consumer only ever sees the
+    newest frame and never holds up the others.
+    """
+
+    def __init__(self, idle_timeout: float = 10.0, max_read_failures: int = 50):
         self.cameras: Dict[str, cv2.VideoCapture] = {}
         self.locks: Dict[str, threading.Lock] = {}
-        self.frame_queues: Dict[str, queue.Queue] = {}  # Frame buffering
+        self.frame_queues: Dict[str, Dict[int, queue.Queue]] = {}  # Per-subscriber latest-frame slots
+        self.readers: Dict[str, threading.Thread] = {}
+        self.stop_events: Dict[str, threading.Event] = {}
+        self.frame_seq: Dict[str, int] = {}
+        self.latest_frames: Dict[str, tuple] = {}  # camera_id -> (seq, frame, captured_at)
+        self.jpeg_cache: Dict[str, tuple] = {}  # camera_id -> (seq, jpeg bytes, multipart chunk)
+        self.encode_locks: Dict[str, threading.Lock] = {}
+        self.idle_timeout = idle_timeout
+        self.max_read_failures = max_read_failures
+        self._lock = threading.Lock()
+        self._next_subscriber_id = 0
 
     def get_camera(self, camera_id: str, rtsp_url: str) -> cv2.VideoCapture:
-        if camera_id not in self.cameras:
-            cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer size
-            self.cameras[camera_id] = cap
-            self.locks[camera_id] = threading.Lock()
-            self.frame_queues[camera_id] = queue.Queue(maxsize=2)  # Prevent backlog
-        return self.cameras[camera_id]
-
-    def release_camera(self, camera_id: str):
+        with self._lock:
+            if camera_id in self.cameras:
+                return self.cameras[camera_id]
+
+        # Open outside the manager lock; RTSP connects can take seconds
+        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer size
+
+        with self._lock:
+            if camera_id in self.cameras:
+                cap.release()
+            else:
+                self.cameras[camera_id] = cap
+                self.locks[camera_id] = threading.Lock()
+                self.frame_queues[camera_id] = {}
+                self.frame_seq[camera_id] = 0
+                self.encode_locks[camera_id] = threading.Lock()
+            return self.cameras[camera_id]
+
+    def subscribe(self, camera_id: str, rtsp_url: str):
+        """Register a consumer and return (subscriber_id, queue), or (None, None) if the camera cannot be opened."""
+        camera = self.get_camera(camera_id, rtsp_url)
+        with self._lock:
+            if self.cameras.get(camera_id) is not camera:
+                # Released or replaced since we got it; the newer capture is not ours to touch
+                return None, None
+            reader = self.readers.get(camera_id)
+            reader_alive = reader is not None and reader.is_alive()
+            # A closed capture with a live reader is only reconnecting, so it can still be joined
+            if camera.isOpened() or reader_alive:
+                subscriber_id = self._next_subscriber_id
+                self._next_subscriber_id += 1
+                frames = queue.Queue(maxsize=1)
+                self.frame_queues[camera_id][subscriber_id] = frames
+
+                if not reader_alive:
+                    stop_event = threading.Event()
+                    self.stop_events[camera_id] = stop_event
+                    reader = threading.Thread(
+                        target=self._read_loop,
+                        args=(camera_id, rtsp_url, stop_event),
+                        daemon=True
+                    )
+                    self.readers[camera_id] = reader
+                    reader.start()
+                return subscriber_id, frames
+
+            # Existing subscribers will notice the dead reader and leave; never pull the stream from under them
+            if self.frame_queues.get(camera_id):
+                return None, None
+
+        # Nobody reads or watches this failed capture; drop it unless it was replaced meanwhile
+        self.release_camera(camera_id, camera)
+        return None, None
+
+    def unsubscribe(self, camera_id: str, subscriber_id: int):
+        with self._lock:
+            self.frame_queues.get(camera_id, {}).pop(subscriber_id, None)
+
+    def subscriber_count(self, camera_id: str) -> int:
+        with self._lock:
+            return len(self.frame_queues.get(camera_id, {}))
+
+    def is_running(self, camera_id: str) -> bool:
+        reader = self.readers.get(camera_id)
+        return reader is not None and reader.is_alive()
+
+    @staticmethod
+    def _offer(frames: queue.Queue, item):
+        """Put item into a single-slot queue, replacing whatever is still unread."""
+        try:
+            frames.put_nowait(item)
+        except queue.Full:
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                frames.put_nowait(item)
+            except queue.Full:
+                pass
+
+    def _read_loop(self, camera_id: str, rtsp_url: str, stop_event: threading.Event):
+        failures = 0
+        idle_since = None
+
+        while not stop_event.is_set():
+            with self._lock:
+                camera = self.cameras.get(camera_id)
+                lock = self.locks.get(camera_id)
+                subscribers = list(self.frame_queues.get(camera_id, {}).values())
+                if camera is None:
+                    return
+
+                # Release the RTSP session once nobody has watched for a while
+                if not subscribers:
+                    idle_since = idle_since or time.time()
+                    if time.time() - idle_since > self.idle_timeout:
+                        logger.info(f"No subscribers left for camera {camera_id}, stopping reader")
+                        self._release_locked(camera_id)
+                        return
+                else:
+                    idle_since = None
+
+            with lock:
+                success, frame = camera.read()
+
+            if not success:
+                failures += 1
+                if failures >= self.max_read_failures:
+                    logger.warning(f"Reconnecting camera {camera_id} after {failures} failed reads")
+                    with lock:
+                        camera.release()
+                        camera.open(rtsp_url, cv2.CAP_FFMPEG)
+                        camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                    failures = 0
+                time.sleep(0.1)
+                continue
+
+            failures = 0
+            with self._lock:
+                if stop_event.is_set():
+                    return
+                self.frame_seq[camera_id] += 1
+                item = (self.frame_seq[camera_id], frame, time.time())
+                self.latest_frames[camera_id] = item
+            for frames in subscribers:
+                self._offer(frames, item)
+
+    def get_jpeg(self, camera_id: str, seq: int, frame):
+        """Return (jpeg bytes, multipart chunk) for frame seq, encoding it at most once."""
+        cached = self.jpeg_cache.get(camera_id)
+        if cached and cached[0] == seq:
+            return cached[1], cached[2]
+
+        encode_lock = self.encode_locks.get(camera_id)
+        if encode_lock is None:
+            return None, None
+
+        with encode_lock:
+            # Another consumer may have encoded this frame while we waited
+            cached = self.jpeg_cache.get(camera_id)
+            if cached and cached[0] == seq:
+                return cached[1], cached[2]
+
+            ret, buffer = cv2.imencode('.jpg', frame)
+            if not ret:
+                return None, None
+            jpeg = buffer.tobytes()
+            chunk = (b'--frame\r\n'
+                     b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            # Never overwrite a newer frame with an older one
+            cached = self.jpeg_cache.get(camera_id)
+            if not cached or cached[0] < seq:
+                self.jpeg_cache[camera_id] = (seq, jpeg, chunk)
+            return jpeg, chunk
+
+    def snapshot_jpeg(self, camera_id: str, rtsp_url: str, timeout: float = 5.0):
+        """Return the latest frame of a camera as JPEG bytes, or None."""
+        item = self.latest_frames.get(camera_id)
+        if item is None or not self.is_running(camera_id):
+            subscriber_id, frames = self.subscribe(camera_id, rtsp_url)
+            if subscriber_id is None:
+                return None
+            try:
+                item = frames.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            finally:
+                # The reader lingers for idle_timeout, so repeated snapshots stay warm
+                self.unsubscribe(camera_id, subscriber_id)
+            if item is None:
+                return None
+
+        seq, frame, _ = item
+        jpeg, _ = self.get_jpeg(camera_id, seq, frame)
+        return jpeg
+
+    def capture_stats(self, camera_id: str) -> dict:
+        """Capture-stage counters: frames decoded and how stale the newest frame is."""
+        item = self.latest_frames.get(camera_id)
+        return {
+            'running': self.is_running(camera_id),
+            'frames_captured': self.frame_seq.get(camera_id, 0),
+            'subscribers': self.subscriber_count(camera_id),
+            'capture_lag': round(time.time() - item[2], 3) if item else None,
+        }
+
+    def _release_locked(self, camera_id: str):
+        if camera_id in self.stop_events:
+            self.stop_events.pop(camera_id).set()
+        self.readers.pop(camera_id, None)
+        self.frame_queues.pop(camera_id, None)
+        self.frame_seq.pop(camera_id, None)
+        self.latest_frames.pop(camera_id, None)
+        self.jpeg_cache.pop(camera_id, None)
+        self.encode_locks.pop(camera_id, None)
         if camera_id in self.cameras:
             self.cameras[camera_id].release()
             del self.cameras[camera_id]
             del self.locks[camera_id]
 
+    def release_camera(self, camera_id: str, camera: cv2.VideoCapture = None):
+        """Stop the camera and send its subscribers None; with camera given, only if it is still current."""
+        with self._lock:
+            if camera is not None and self.cameras.get(camera_id) is not camera:
+                return
+            subscribers = list(self.frame_queues.get(camera_id, {}).values())
+            self._release_locked(camera_id)
+        for frames in subscribers:
+            self._offer(frames, None)
+
 camera_manager = CameraManager()
 
 def generate_frames(camera_id: str, rtsp_url: str):
-    camera = camera_manager.get_camera(camera_id, rtsp_url)
-    if not camera.isOpened():
+    subscriber_id, frames = camera_manager.subscribe(camera_id, rtsp_url)
+    if subscriber_id is None:
         app.logger.error(f"Failed to open camera {camera_id} with RTSP URL: {rtsp_url}")
         return
-    lock = camera_manager.locks[camera_id]
-    
-    while True:
-        with lock:
-            success, frame = camera.read()
-            if not success:
-                app.logger.error(f"Failed to read frame from camera {camera_id}")
+
+    try:
+        while True:
+            try:
+                item = frames.get(timeout=5)
+            except queue.Empty:
+                if not camera_manager.is_running(camera_id):
+                    break
+                continue
+            if item is None:
+                app.logger.error(f"Stream for camera {camera_id} stopped")
                 break
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
+
+            seq, frame, _ = item
+            _, chunk = camera_manager.get_jpeg(camera_id, seq, frame)
+            if chunk is None:
                 app.logger.error(f"Failed to encode frame from camera {camera_id}")
                 break
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+            yield chunk
+    finally:
+        # Runs when the client disconnects and the response iterable is closed
+        camera_manager.unsubscribe(camera_id, subscriber_id)
 
-def get_rtsp_url(camera_id: str) -> str:
+def load_rtsp_url(camera_id: str) -> str:
     response = supabase.table('cameras').select('rtsp_url').eq('camera_id', camera_id).execute()
     if response.data and len(response.data) > 0:
         return unquote(response.data[0]['rtsp_url'])
     return None
 
+def load_model_details(model_id: str) -> dict:
+    response = supabase.table('models').select('*').eq('model_id', model_id).execute()
+    if response.data and len(response.data) > 0:
+        return response.data[0]
+    return None
+
+# Camera and model rows change rarely; see /metadata/invalidate
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "60"))
+METADATA_NEGATIVE_TTL = float(os.getenv("METADATA_NEGATIVE_TTL", "10"))
+metadata_caches = {
+    'cameras': MetadataCache(load_rtsp_url, METADATA_CACHE_TTL, METADATA_NEGATIVE_TTL),
+    'models': MetadataCache(load_model_details, METADATA_CACHE_TTL, METADATA_NEGATIVE_TTL),
+}
+METADATA_ID_COLUMNS = {'cameras': 'camera_id', 'models': 'model_id'}
+
+def get_rtsp_url(camera_id: str) -> str:
+    return metadata_caches['cameras'].get(camera_id)
+
+@app.route('/metadata/invalidate', methods=['POST'])
+def invalidate_metadata():
+    """Drop cached camera/model rows.
+
+    Accepts {"table": "cameras", "id": "..."} (omit id to drop the whole
+    table, or send no body to drop everything), or a Supabase database
+    webhook payload, so a webhook on the cameras and models tables keeps
+    the cache in sync as rows change.
+    """
+    data = request.get_json(silent=True) or {}
+    table = data.get('table')
+    if table is None:
+        dropped = sum(cache.invalidate() for cache in metadata_caches.values())
+        return jsonify({'status': 'success', 'dropped': dropped})
+    if table not in metadata_caches:
+        return jsonify({'error': f"Unknown table: {table}"}), 400
+
+    column = METADATA_ID_COLUMNS[table]
+    cache = metadata_caches[table]
+    if 'id' in data:
+        ids = [data['id']]
+    elif 'record' in data or 'old_record' in data:
+        # Database webhook: drop the row as it was before and after the change
+        ids = {row[column] for row in (data.get('record'), data.get('old_record')) if row and row.get(column) is not None}
+    else:
+        ids = None
+    dropped = cache.invalidate() if ids is None else sum(cache.invalidate(key) for key in ids)
+    return jsonify({'status': 'success', 'dropped': dropped})
+
+# SERVER_MODE=asgi serves /video_feed from StreamHub on one event loop (needs uvicorn and asgiref)
+SERVER_MODE = os.getenv("SERVER_MODE", "flask")
+stream_hub: StreamHub = None
+
+@app.route('/stream_stats')
+def stream_stats():
+    return jsonify({'mode': SERVER_MODE, **(stream_hub.stats() if SERVER_MODE == 'asgi' else {})})
+
+@app.route('/metadata_cache_stats')
+def metadata_cache_stats():
+    return jsonify({table: cache.stats() for table, cache in metadata_caches.items()})
+
 @app.route('/video_feed/<camera_id>')
 def video_feed(camera_id):
     response = Response(
@@ -216,19 +445,11 @@ def capture_frame(camera_id):
     if not rtsp_url:
         return {'error': 'Camera not found'}, 404
     
-    camera = camera_manager.get_camera(camera_id, rtsp_url)
-    lock = camera_manager.locks[camera_id]
-    
-    with lock:
-        success, frame = camera.read()
-        if not success:
-            return {'error': 'Failed to capture frame'}, 500
-        
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            return {'error': 'Failed to encode frame'}, 500
-            
-        return Response(buffer.tobytes(), mimetype='image/jpeg')
+    jpeg = camera_manager.snapshot_jpeg(camera_id, rtsp_url)
+    if jpeg is None:
+        return {'error': 'Failed to capture frame'}, 500
+
+    return Response(jpeg, mimetype='image/jpeg')
 
 @app.route('/health')
 def health_check():
@@ -247,8 +468,8 @@ def generate_face_encoding():
         return jsonify({'error': 'No face detected'}), 400
 
     face_encoding = face_encodings[0]
-    # Ensure proper padding in base64 encoding
-    serialized_encoding = base64.b64encode(pickle.dumps(face_encoding)).decode('utf-8')
+    # Compact versioned float32 format; see face_codec
+    serialized_encoding = face_codec.encode(face_encoding)
     
     return jsonify({
         'face_encoding': serialized_encoding,
@@ -266,20 +487,68 @@ def handle_model_control():
         if action == 'start':
             if camera_id in active_models:
                 return jsonify({'error': 'Model already running'}), 400
+
+            # A stopped worker may still be finishing its last frame and tearing down
+            previous = model_workers.get(camera_id)
+            if previous is not None and previous.is_alive():
+                previous.join(timeout=MODEL_STOP_TIMEOUT)
+                if previous.is_alive():
+                    return jsonify({'error': 'Previous model is still stopping'}), 409
                 
-            # Warm-up frame capture
             rtsp_url = get_rtsp_url(camera_id)
-            test_cap = cv2.VideoCapture(rtsp_url)
-            if not test_cap.isOpened():
+            if not rtsp_url:
+                return jsonify({'error': 'Camera not found'}), 404
+
+            target_fps = data.get('target_fps')
+            if target_fps is not None:
+                try:
+                    target_fps = float(target_fps)
+                except (TypeError, ValueError):
+                    target_fps = 0
+                if target_fps <= 0:
+                    return jsonify({'error': 'target_fps must be a positive number'}), 400
+
+            motion = data.get('motion', {})
+            if motion is not False:
+                try:
+                    MotionGate(**{**MOTION_GATE_DEFAULTS, **motion})
+                except (TypeError, ValueError) as e:
+                    return jsonify({'error': f"Invalid motion options: {e}"}), 400
+
+            image = data.get('image', {})
+            try:
+                for defaults in IMAGE_PREP_DEFAULTS.values():
+                    ImagePrep(**{**defaults, **image})
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f"Invalid image options: {e}"}), 400
+
+            face_detector = None
+            if 'face_detection' in data:
+                try:
+                    face_detector = make_face_detector(data['face_detection'])
+                except (TypeError, ValueError, cv2.error) as e:
+                    return jsonify({'error': f"Invalid face_detection options: {e}"}), 400
+
+            # Share the stream CameraManager already owns instead of opening a new RTSP session
+            subscriber_id, frames = camera_manager.subscribe(camera_id, rtsp_url)
+            if subscriber_id is None:
                 return jsonify({'error': 'Camera unreachable'}), 500
-            test_cap.release()
 
-            active_models[camera_id] = {'running': True}
-            threading.Thread(
+            entry = {'target_fps': target_fps, 'motion': motion, 'image': image}
+            worker = threading.Thread(
                 target=run_model_inference,
-                args=(camera_id, model_id),
+                args=(camera_id, model_id, subscriber_id, frames, entry),
                 daemon=True
-            ).start()
+            )
+            entry['thread'] = worker
+            if active_models.setdefault(camera_id, entry) is not entry:
+                camera_manager.unsubscribe(camera_id, subscriber_id)
+                return jsonify({'error': 'Model already running'}), 400
+            model_workers[camera_id] = worker
+            # Only a successful start applies the override; teardown drops it again
+            if face_detector:
+                face_detectors[camera_id] = face_detector
+            worker.start()
 
         elif action == 'stop':
             active_models.pop(camera_id, None)
@@ -289,12 +558,28 @@ def handle_model_control():
     except Exception as e:
         logger.error(f"Model control error: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    stats = {}
+    for camera_id, model in list(active_models.items()):
+        pipeline = model.get('pipeline')
+        stats[camera_id] = {
+            'capture': camera_manager.capture_stats(camera_id),
+            'inference': pipeline.stats() if pipeline else None,
+            'schedule': frame_scheduler.stats(camera_id),
+        }
+    return jsonify(stats)
+
+@app.route('/db_writer_stats')
+def db_writer_stats():
+    return jsonify({**db_writer.stats, 'pending': db_writer.rows.qsize()})
+
 def get_model_details(model_id: str) -> dict:
     try:
-        response = supabase.table('models').select('*').eq('model_id', model_id).execute()
-        
-        if response.data and len(response.data) > 0:
-            return response.data[0]
+        details = metadata_caches['models'].get(model_id)
+        if details is not None:
+            return details
         else:
             app.logger.error(f"No model found with ID: {model_id}")
             return {'error': 'Model not found'}
@@ -302,166 +587,389 @@ def get_model_details(model_id: str) -> dict:
         app.logger.error(f"Error fetching model details: {e}")
         return {'error': str(e)}
 
-def run_model_inference(camera_id, model_id):
-    rtsp_url = get_rtsp_url(camera_id)
-    cap = cv2.VideoCapture(rtsp_url)
-    
-    model_details = get_model_details(model_id)
-    if not model_details or 'error' in model_details:
-        app.logger.error(f"Failed to get model details for {model_id}")
-        return
-    
-    while active_models.get(camera_id, {}).get('running', False):
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        
-        # Process based on model type
-        if model_details['type'] == 'helmet':
-            process_helmet_model(frame, camera_id)
-        elif model_details['type'] == 'fire':
-            process_fire_model(frame, camera_id)
-        elif model_details['type'] == 'attendance':
-            process_attendance(frame, camera_id)
-    
-    cap.release()
+# Default analysed frames per second per model type; /model-control may override per camera
+TARGET_FPS = {
+    'attendance': float(os.getenv("TARGET_FPS_ATTENDANCE", "5")),
+    'helmet': float(os.getenv("TARGET_FPS_HELMET", "2")),
+    'fire': float(os.getenv("TARGET_FPS_FIRE", "2")),
+}
+# Motion gate defaults; /model-control can pass per-camera 'motion' options, or false to disable
+MOTION_GATE_DEFAULTS = {
+    'threshold': float(os.getenv("MOTION_THRESHOLD", "0.01")),
+    'keyframe_interval': float(os.getenv("MOTION_KEYFRAME_INTERVAL", "30")),
+}
+
+frame_scheduler = FrameScheduler(float(os.getenv("INFERENCE_CPU_BUDGET", str(os.cpu_count() or 1))))
+
+def inference_cpu_time() -> float:
+    """CPU seconds used by this thread, plus attendance pool work done on its behalf."""
+    return time.thread_time() + (attendance_pool.offloaded_cpu_time() if attendance_pool else 0.0)
+
+def retire_model(camera_id, entry):
+    """Drop entry from active_models, unless the camera has been restarted with a new one."""
+    if active_models.get(camera_id) is entry:
+        active_models.pop(camera_id, None)
+
+def run_model_inference(camera_id, model_id, subscriber_id, frames, entry):
+    """Analyse frames for one start of a model; runs until entry stops being the camera's active entry."""
+    schedule_token = None
+    try:
+        model_details = get_model_details(model_id)
+        if not model_details or 'error' in model_details:
+            app.logger.error(f"Failed to get model details for {model_id}")
+            retire_model(camera_id, entry)
+            return
+
+        pipeline = InferencePipeline(camera_id, model_details['type'])
+        entry['pipeline'] = pipeline
+        target_fps = entry.get('target_fps') or TARGET_FPS.get(model_details['type'], 2.0)
+        schedule_token = frame_scheduler.register(camera_id, model_details['type'], target_fps)
+        motion_options = entry.get('motion', {})
+        motion_gate = MotionGate(**{**MOTION_GATE_DEFAULTS, **motion_options}) if motion_options is not False else None
+        if model_details['type'] in IMAGE_PREP_DEFAULTS:
+            image_options = entry.get('image', {})
+            image_preps[camera_id] = ImagePrep(**{**IMAGE_PREP_DEFAULTS[model_details['type']], **image_options})
+
+        while active_models.get(camera_id) is entry:
+            # Sleep until this camera's next slot, then take the newest frame
+            wait = frame_scheduler.wait_time(camera_id)
+            if wait > 0:
+                time.sleep(min(wait, 1.0))
+                continue
+
+            try:
+                item = frames.get(timeout=1)
+            except queue.Empty:
+                # A reader torn down without the None sentinel leaves the queue silent forever
+                if not camera_manager.is_running(camera_id):
+                    app.logger.error(f"Reader for camera {camera_id} is gone, ending inference")
+                    retire_model(camera_id, entry)
+                    break
+                continue
+            if item is None:
+                app.logger.error(f"Stream for camera {camera_id} stopped, ending inference")
+                retire_model(camera_id, entry)
+                break
+            seq, frame, captured_at = item
+            pipeline.on_frame(seq, captured_at)
+            started_at = time.time()
+            started_cpu = inference_cpu_time()
+
+            # Static scenes never reach the expensive stages
+            if motion_gate and not motion_gate.check(frame, started_at):
+                pipeline.on_gated()
+                frame_scheduler.skip(camera_id, started_at)
+                continue
+
+            # Process based on model type
+            try:
+                if model_details['type'] == 'helmet':
+                    process_helmet_model(frame, camera_id)
+                elif model_details['type'] == 'fire':
+                    process_fire_model(frame, camera_id)
+                elif model_details['type'] == 'attendance':
+                    process_attendance(frame, camera_id)
+            except Exception as e:
+                app.logger.error(f"Inference error on camera {camera_id}: {e}")
+
+            pipeline.on_result(captured_at, started_at)
+            frame_scheduler.record(camera_id, started_at, inference_cpu_time() - started_cpu)
+    finally:
+        frame_scheduler.unregister(camera_id, schedule_token)
+        camera_manager.unsubscribe(camera_id, subscriber_id)
+        # Per-camera state is keyed by camera_id only; leave it alone if a newer start owns it
+        current = active_models.get(camera_id)
+        if current is None or current is entry:
+            detection_cache.clear(camera_id)
+            hands_pool.release(camera_id)
+            face_trackers.pop(camera_id, None)
+            face_detectors.pop(camera_id, None)
+            fire_screens.pop(camera_id, None)
+            image_preps.pop(camera_id, None)
+
+# Near-duplicate frames reuse a recent Gemini verdict instead of another call
+detection_cache = PerceptualCache(
+    max_distance=int(os.getenv("DETECTION_CACHE_MAX_DISTANCE", "5")),
+    ttl=float(os.getenv("DETECTION_CACHE_TTL", "5"))
+)
+
+# Payload size per model type; /model-control can pass per-camera 'image' options
+# (max_side, quality, roi, max_bytes, min_quality). Tune with benchmark_image_prep.py
+IMAGE_PREP_DEFAULTS = {
+    model_type: {
+        'max_side': int(os.getenv(f"IMAGE_MAX_SIDE_{model_type.upper()}", "1024")) or None,
+        'quality': int(os.getenv(f"IMAGE_QUALITY_{model_type.upper()}", "80")),
+        'max_bytes': int(os.getenv(f"IMAGE_MAX_BYTES_{model_type.upper()}", "0")) or None,
+    }
+    for model_type in ('fire', 'helmet')
+}
+image_preps: Dict[str, ImagePrep] = {}
+
+def ask_assistant(frame, camera_id, prompt, model_type):
+    """Get a verdict for frame, from detection_cache when a near-duplicate was just classified."""
+    frame_hash = dhash(frame)
+    cached = detection_cache.get(camera_id, model_type, frame_hash)
+    if cached is not None:
+        return cached
+
+    prep = image_preps.get(camera_id) or ImagePrep(**IMAGE_PREP_DEFAULTS[model_type])
+    encoded_frame = prep.prepare(frame)
+    # Blocking is fine here: each camera has one inference thread that analyses one
+    # frame at a time, so waiting threads are bounded by cameras, not requests
+    response = assistant.answer(encoded_frame, prompt, model_type, camera_id)
+
+    # Only real verdicts are reusable; skipped calls and errors are not
+    if response is not SKIPPED and not response.startswith("Error") and response not in ("Model not initialized", "Invalid model type"):
+        detection_cache.put(camera_id, model_type, frame_hash, response)
+    return response
+
+@app.route('/detection_cache_stats')
+def detection_cache_stats():
+    return jsonify(detection_cache.stats())
+
+@app.route('/assistant_stats')
+def assistant_stats():
+    return jsonify(assistant.stats())
 
 def process_helmet_model(frame, camera_id):
-    _, buffer = cv2.imencode('.jpg', frame)
-    encoded_frame = base64.b64encode(buffer).decode()
-    
-    response = assistant.answer(
-        encoded_frame,
+    response = ask_assistant(
+        frame,
+        camera_id,
         "Detect if a person is wearing a helmet. Respond with 'Helmet detected' or 'No helmet detected'.",
         "helmet"
     )
     
-    detected = response if response else 'No helmet detected'
+    # Rate-limited calls have no verdict; never record them as a negative
+    if response is SKIPPED:
+        app.logger.debug(f"Camera {camera_id}: helmet check skipped by rate limiter")
+        return
+
+    detected = response
     app.logger.info(f"Camera {camera_id}: {detected}")
     
-    # Insert detection result into Supabase
-    supabase.table('helmet_violations').insert({
+    # Queue detection result for Supabase
+    db_writer.insert('helmet_violations', {
         'camera_id': camera_id,
         'detected': detected,
         'created_at': datetime.now().isoformat()
-    }).execute()
+    })
+
+# Local flame screen in front of Gemini; FIRE_SCREEN_THRESHOLD=0 sends every frame
+FIRE_SCREEN_OPTIONS = {
+    'threshold': float(os.getenv("FIRE_SCREEN_THRESHOLD", "0.3")),
+    'alarm_threshold': float(os.getenv("FIRE_SCREEN_ALARM_THRESHOLD", "0.7")),
+}
+fire_screens: Dict[str, FireScreen] = {}
+
+@app.route('/fire_screen_stats')
+def fire_screen_stats():
+    return jsonify({camera_id: screen.stats() for camera_id, screen in list(fire_screens.items())})
 
 def process_fire_model(frame, camera_id):
-    _, buffer = cv2.imencode('.jpg', frame)
-    encoded_frame = base64.b64encode(buffer).decode()
-    
-    response = assistant.answer(
-        encoded_frame,
+    screen = fire_screens.setdefault(camera_id, FireScreen(**FIRE_SCREEN_OPTIONS))
+
+    # Frames without flame-like pixels never reach the model, like motion-gated frames
+    if not screen.should_escalate(frame):
+        return
+
+    response = ask_assistant(
+        frame,
+        camera_id,
         "Detect if there is a fire. Respond with 'Fire detected' or 'No fire detected'.",
         "fire"
     )
     
-    detected = response if response else 'No fire detected'
+    # Rate-limited calls have no verdict; never record them as a negative
+    if response is SKIPPED:
+        app.logger.debug(f"Camera {camera_id}: fire check skipped by rate limiter")
+        return
+
+    # Fall back to the local verdict while Gemini is unavailable
+    if response.startswith("Error") or response == "Model not initialized":
+        app.logger.warning(f"Camera {camera_id}: fire model unavailable ({response}), using local screen")
+        response = screen.verdict()
+
+    detected = response
     app.logger.info(f"Camera {camera_id}: {detected}")
     
-    # Insert detection result into Supabase
-    supabase.table('fire_detections').insert({
+    # Queue detection result for Supabase
+    db_writer.insert('fire_detections', {
         'camera_id': camera_id,
         'detected': detected,
         'created_at': datetime.now().isoformat()
-    }).execute()
+    })
+
+presence_tracker = PresenceTracker(
+    cooldown=float(os.getenv("ATTENDANCE_COOLDOWN", "30")),
+    confirm_window=float(os.getenv("ATTENDANCE_CONFIRM_WINDOW", "2")),
+    min_confirmations=int(os.getenv("ATTENDANCE_MIN_CONFIRMATIONS", "2")),
+    session_timeout=float(os.getenv("ATTENDANCE_SESSION_TIMEOUT", "300"))
+)
+
+# Face matcher backend: 'exact' brute force, or 'ivf' for large galleries
+FACE_MATCHER_OPTIONS = {'kind': os.getenv("FACE_MATCHER", "exact")}
+if FACE_MATCHER_OPTIONS['kind'] == 'ivf':
+    FACE_MATCHER_OPTIONS['n_probe'] = int(os.getenv("FACE_MATCHER_N_PROBE", "8"))
+
+employee_cache: EmployeeCache = None
+
+@app.route('/employees/reload', methods=['POST'])
+def reload_employees():
+    try:
+        count = employee_cache.reload()
+        return jsonify({'status': 'success', 'employees': count})
+    except Exception as e:
+        logger.error(f"Employee reload error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/employees/migrate_encodings', methods=['POST'])
+def migrate_employee_encodings():
+    """Rewrite legacy pickled face encodings in the compact binary format."""
+    try:
+        migrated = face_codec.migrate_encodings(supabase)
+        return jsonify({'status': 'success', 'migrated': migrated})
+    except Exception as e:
+        logger.error(f"Encoding migration error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Face detection settings; /model-control can override them per camera
+FACE_DETECTION_DEFAULTS = {
+    'method': os.getenv("FACE_DETECTION_METHOD", "hog"),
+    'scale': float(os.getenv("FACE_DETECTION_SCALE", "1.0")),
+}
+face_detectors: Dict[str, FaceDetector] = {}
+
+def make_face_detector(options: dict = None) -> FaceDetector:
+    return FaceDetector(**{**FACE_DETECTION_DEFAULTS, **(options or {})})
+
+def get_face_detector(camera_id: str) -> FaceDetector:
+    detector = face_detectors.get(camera_id)
+    if detector is None:
+        detector = face_detectors.setdefault(camera_id, make_face_detector())
+    return detector
+
+# Optional process pool for face detection and encoding; 0 keeps it in-process
+ATTENDANCE_WORKERS = int(os.getenv("ATTENDANCE_WORKERS", "0"))
+attendance_pool: AttendancePool = None
+
+def attendance_frame(rgb_frame):
+    """Wrap a frame for detection and matching in-process or on the worker pool."""
+    return attendance_pool.frame(rgb_frame) if attendance_pool else LocalFrame(rgb_frame)
+
+# Per-camera face trackers, dropped when the camera's model stops
+face_trackers: Dict[str, FaceTracker] = {}
 
 # MODIFIED process_attendance FUNCTION
 def process_attendance(frame, camera_id):
-    # Frame skipping initialization
-    if not hasattr(process_attendance, "frame_counter"):
-        process_attendance.frame_counter = 0
-    process_attendance.frame_counter += 1
-    if process_attendance.frame_counter % 5 != 0:  # Process every 5th frame
-        return
-
+    # Frame sampling is handled per camera by frame_scheduler in run_model_inference
     # Employee data caching
-    if not hasattr(process_attendance, "employee_cache"):
-        employees_response = supabase.table('employees').select('*').execute()
-        process_attendance.employee_cache = [
-            {**emp, "face_encoding": pickle.loads(safe_base64_decode(emp['face_encoding']))}
-            for emp in employees_response.data
-        ] if employees_response.data else []
-        logger.info("Preloaded employee encodings")
+    employee_store = employee_cache.get()
 
     # Convert frame and get dimensions
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     frame_height, frame_width, _ = rgb_frame.shape
 
-    # Face detection
-    face_locations = face_recognition.face_locations(rgb_frame, model="hog")
-    if not face_locations:
-        return
+    with attendance_frame(rgb_frame) as shared_frame:
+        # Face detection, possibly on a downscaled copy; boxes come back in full-frame pixels
+        face_locations = shared_frame.detect(get_face_detector(camera_id))
 
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-    
-    # Employee matching
-    for face_encoding in face_encodings:
-        similarities = face_recognition.face_distance(
-            [e["face_encoding"] for e in process_attendance.employee_cache], 
-            face_encoding
-        )
-        best_match_idx = np.argmin(similarities)
-        
-        if similarities[best_match_idx] < 0.55:
-            employee = process_attendance.employee_cache[best_match_idx]
-            logger.info(f"Matched employee: {employee['name']}")
-
-            # Hand detection with MediaPipe
-            # Configure MediaPipe Hands with image dimensions
-            hands = mp_hands.Hands(
-                static_image_mode=True,  # Set to True for better accuracy
-                max_num_hands=2,
-                min_detection_confidence=0.7,
-                min_tracking_confidence=0.5,
-                model_complexity=1
-            )
+        # Follow faces across frames so each person is only encoded when their track needs it
+        tracker = face_trackers.setdefault(camera_id, FaceTracker())
+        tracks = tracker.update(face_locations)
+        if not face_locations:
+            return
 
-            # Process the frame
-            results = hands.process(rgb_frame)
+        pending = [i for i, track in enumerate(tracks) if tracker.needs_identity(track)]
+        if pending:
+            # Employee matching: all new faces in one batched distance computation
+            matches = shared_frame.match([face_locations[i] for i in pending], employee_store, threshold=0.55)
+            for i, face_matches in zip(pending, matches):
+                employee = face_matches[0] if face_matches else None
+                previous = tracks[i].identity
+                if employee and (previous is None or previous['employee_id'] != employee['employee_id']):
+                    logger.info(f"Matched employee: {employee['name']} (track {tracks[i].track_id})")
+                tracker.set_identity(tracks[i], employee)
+
+    # Attendance is evaluated per track, using the identity cached on it
+    for face_location, track in zip(face_locations, tracks):
+        if track.identity:
+            employee = track.identity
+
+            # Hand detection with this camera's pooled MediaPipe graph
+            hands = hands_pool.get(camera_id)
+
+            # Only look for hands around this face, so a gesture is credited to the right person
+            roi = hand_roi(face_location, frame_width, frame_height)
+            left, top, right, bottom = roi
+            results = hands.process(np.ascontiguousarray(rgb_frame[top:bottom, left:right]))
             
             if results.multi_hand_landmarks:
                 for hand_landmarks in results.multi_hand_landmarks:
-                    # Get specific landmarks for gesture detection
-                    wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-                    thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-                    thumb_ip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_IP]
-                    index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                    index_pip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP]
+                    # Get specific landmarks for gesture detection, in frame coordinates
+                    points = landmarks_to_frame(hand_landmarks, roi, frame_width, frame_height)
+                    wrist = points[mp_hands.HandLandmark.WRIST]
+                    thumb_tip = points[mp_hands.HandLandmark.THUMB_TIP]
+                    thumb_ip = points[mp_hands.HandLandmark.THUMB_IP]
+                    index_tip = points[mp_hands.HandLandmark.INDEX_FINGER_TIP]
+                    index_pip = points[mp_hands.HandLandmark.INDEX_FINGER_PIP]
                     
                     # Calculate angles and distances for more accurate gesture detection
-                    thumb_angle = calculate_angle(
-                        (wrist.x, wrist.y),
-                        (thumb_ip.x, thumb_ip.y),
-                        (thumb_tip.x, thumb_tip.y)
-                    )
+                    thumb_angle = calculate_angle(wrist, thumb_ip, thumb_tip)
                     
-                    index_angle = calculate_angle(
-                        (wrist.x, wrist.y),
-                        (index_pip.x, index_pip.y),
-                        (index_tip.x, index_tip.y)
-                    )
+                    index_angle = calculate_angle(wrist, index_pip, index_tip)
                     
                     # Determine gesture based on angles
-                    if thumb_angle > 150 and thumb_tip.y < wrist.y:  # Thumb is pointing up
+                    if thumb_angle > 150 and thumb_tip[1] < wrist[1]:  # Thumb is pointing up
                         gesture = "thumb_up"
                     else:
                         gesture = "thumb_down"
                     
-                    try:
-                        # Log the attendance with the detected gesture
-                        supabase.table('attendance_logs').insert({
-                            'employee_id': employee['employee_id'],
-                            'camera_id': camera_id,
-                            'gesture_detected': gesture,
-                            'timestamp': datetime.now().isoformat()
-                        }).execute()
-                        logger.info(f"Attendance logged: {employee['name']} - {gesture}")
-                    except Exception as e:
-                        logger.error(f"Database error for employee {employee['name']}: {str(e)}")
-            
-            # Clean up MediaPipe resources
-            hands.close()
+                    # Only log when the employee's confirmed gesture changes
+                    if presence_tracker.observe(camera_id, employee['employee_id'], gesture) is None:
+                        continue
+
+                    # Log the attendance with the detected gesture
+                    db_writer.insert('attendance_logs', {
+                        'employee_id': employee['employee_id'],
+                        'camera_id': camera_id,
+                        'gesture_detected': gesture,
+                        'timestamp': datetime.now().isoformat()
+                    })
+                    logger.info(f"Attendance logged: {employee['name']} - {gesture}")
+
+# Hand search region around a face, in face widths/heights
+HAND_ROI_SIDE = float(os.getenv("HAND_ROI_SIDE", "1.5"))
+HAND_ROI_ABOVE = float(os.getenv("HAND_ROI_ABOVE", "0.5"))
+HAND_ROI_BELOW = float(os.getenv("HAND_ROI_BELOW", "3.0"))
+
+def hand_roi(face_location, frame_width, frame_height):
+    """
+    Expand a face_recognition (top, right, bottom, left) box to the region
+    where that person's raised hand can be, clipped to the frame.
+    Returns (left, top, right, bottom) in pixels.
+    """
+    top, right, bottom, left = face_location
+    face_width = right - left
+    face_height = bottom - top
+    return (
+        max(0, int(left - HAND_ROI_SIDE * face_width)),
+        max(0, int(top - HAND_ROI_ABOVE * face_height)),
+        min(frame_width, int(right + HAND_ROI_SIDE * face_width)),
+        min(frame_height, int(bottom + HAND_ROI_BELOW * face_height)),
+    )
+
+def landmarks_to_frame(hand_landmarks, roi, frame_width, frame_height):
+    """
+    Map landmarks normalized to the ROI crop back to (x, y) normalized to
+    the full frame, so gesture thresholds behave as they did on full frames.
+    """
+    left, top, right, bottom = roi
+    scale_x = (right - left) / frame_width
+    scale_y = (bottom - top) / frame_height
+    return [
+        (left / frame_width + lm.x * scale_x, top / frame_height + lm.y * scale_y)
+        for lm in hand_landmarks.landmark
+    ]
 
 def calculate_angle(p1, p2, p3):
     """
@@ -487,13 +995,63 @@ def calculate_angle(p1, p2, p3):
     return angle_deg
 
 
+def create_app() -> Flask:
+    """Connect to Supabase and start the writer, assistant, stream hub and worker pool.
+
+    Only the server process calls this, so spawned attendance workers that
+    re-import this module get none of it.
+    """
+    global supabase, db_writer, mp_hands, assistant, stream_hub, employee_cache, attendance_pool
+    import mediapipe as mp
+
+    mp_hands = mp.solutions.hands
+    supabase = create_client(os.getenv("VITE_SUPABASE_URL"), os.getenv("VITE_SUPABASE_ANON_KEY"))
+    db_writer = SupabaseWriter(
+        supabase,
+        batch_size=int(os.getenv("DB_WRITER_BATCH_SIZE", "50")),
+        flush_interval=float(os.getenv("DB_WRITER_FLUSH_INTERVAL", "1.0")),
+        spill_dir=os.getenv("DB_WRITER_SPILL_DIR", "supabase_spill")
+    ).start()
+    assistant = Assistant()
+    stream_hub = StreamHub(
+        camera_manager,
+        get_rtsp_url,
+        max_streams=int(os.getenv("STREAM_MAX_CLIENTS", "500")),
+        stall_timeout=float(os.getenv("STREAM_STALL_TIMEOUT", "10")),
+    )
+    employee_cache = EmployeeCache(
+        supabase,
+        refresh_interval=float(os.getenv("EMPLOYEE_CACHE_REFRESH_INTERVAL", "60")),
+        matcher_options=FACE_MATCHER_OPTIONS,
+        cursor_column=os.getenv("EMPLOYEE_CACHE_CURSOR_COLUMN", "updated_at"),
+        full_reload_interval=float(os.getenv("EMPLOYEE_CACHE_FULL_RELOAD_INTERVAL", "600"))
+    )
+    if ATTENDANCE_WORKERS > 0:
+        attendance_pool = AttendancePool(ATTENDANCE_WORKERS)
+    return app
 
 # Add cleanup handler
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
-    hands_processor.close()
+    # Stop inference workers before closing the graphs they may be using
+    workers = [active_models.pop(camera_id, {}).get('thread') for camera_id in list(active_models)]
+    for worker in workers:
+        if worker:
+            worker.join(timeout=5)
+    hands_pool.close_all()
     logger.info("Cleaned up MediaPipe resources")
+    if attendance_pool:
+        attendance_pool.close()
+        logger.info("Stopped attendance worker processes")
+    db_writer.stop()
+    logger.info("Flushed pending database writes")
     return jsonify({'status': 'shutting down'})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
+    create_app()
+    if SERVER_MODE == 'asgi':
+        import uvicorn
+        from asgiref.wsgi import WsgiToAsgi
+        uvicorn.run(create_asgi_app(stream_hub, WsgiToAsgi(app)), host='0.0.0.0', port=8000)
+    else:
+        app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
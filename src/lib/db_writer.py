@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# PostgREST / Postgres error codes that mean "try again later", not "these rows are bad":
+# connection and schema cache (PGRST0xx), auth (PGRST3xx), connection exception (08),
+# transaction rollback (40), insufficient resources (53) and operator intervention (57)
+TRANSIENT_CODES = ('PGRST0', 'PGRST3', '08', '40', '53', '57')
+
+
+def is_rejection(error: Exception) -> bool:
+    """True when Supabase refused the rows themselves, e.g. a foreign key violation.
+
+    supabase-py raises postgrest's APIError with the error code in .code;
+    connection failures raise transport errors without one.
+    """
+    code = getattr(error, 'code', None)
+    return isinstance(code, str) and bool(code) and not code.startswith(TRANSIENT_CODES)
+
+
+class SupabaseWriter:
+    """Background writer that bulk-inserts rows per table and spills them to disk while Supabase is down.
+
+    Rows Supabase rejects are kept in spill_dir/rejected. The client only needs table(name).insert(rows).execute().
+    """
+
+    def __init__(self, client, batch_size: int = 50, flush_interval: float = 1.0,
+                 max_queue: int = 10000, max_retries: int = 3, backoff: float = 0.5,
+                 spill_dir: str = "supabase_spill", replay_interval: float = 30.0):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spill_dir = spill_dir
+        self.replay_interval = replay_interval
+        self.rows: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.buffers: Dict[str, List[dict]] = {}
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'retries': 0, 'spilled': 0, 'replayed': 0,
+                      'rejected': 0}
+        self._stats_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still buffered and stop the writer thread."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def insert(self, table: str, row: dict):
+        """Queue a row for insertion without blocking the caller."""
+        try:
+            self.rows.put_nowait((table, row))
+            self._count('queued')
+        except queue.Full:
+            # Never block an inference thread; keep the row on disk instead
+            logger.warning(f"Writer queue full, spilling row for {table}")
+            self._spill(table, [row])
+
+    def flush(self):
+        """Write every buffered row now. Called from the writer thread."""
+        self._drain()
+        for table in list(self.buffers):
+            self._flush_table(table)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _drain(self):
+        while True:
+            try:
+                table, row = self.rows.get_nowait()
+            except queue.Empty:
+                return
+            self.buffers.setdefault(table, []).append(row)
+
+    def _run(self):
+        next_flush = time.time() + self.flush_interval
+        next_replay = time.time() + self.replay_interval
+
+        while not self._stop_event.is_set():
+            try:
+                try:
+                    table, row = self.rows.get(timeout=max(0.0, next_flush - time.time()))
+                    buffer = self.buffers.setdefault(table, [])
+                    buffer.append(row)
+                    if len(buffer) >= self.batch_size:
+                        self._flush_table(table)
+                except queue.Empty:
+                    pass
+
+                now = time.time()
+                if now >= next_flush:
+                    next_flush = now + self.flush_interval
+                    self.flush()
+                if now >= next_replay:
+                    next_replay = now + self.replay_interval
+                    self._replay_spill()
+            except Exception as e:
+                # A bad row or spill file must never stop the writer for good
+                logger.error(f"Writer loop error: {e}")
+
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Final flush failed: {e}")
+
+    def _flush_table(self, table: str):
+        rows = self.buffers.pop(table, [])
+        while rows:
+            batch, rows = rows[:self.batch_size], rows[self.batch_size:]
+            pending = self._write(table, batch, self.max_retries)
+            if pending:
+                self._spill(table, pending)
+
+    def _write(self, table: str, rows: List[dict], attempts: int) -> List[dict]:
+        """Insert rows; returns the ones left unwritten because Supabase is unreachable."""
+        for attempt in range(attempts):
+            try:
+                self.client.table(table).insert(rows).execute()
+                self._count('written', len(rows))
+                self._count('batches')
+                return []
+            except Exception as e:
+                if is_rejection(e):
+                    return self._split(table, rows, attempts, e)
+                logger.error(f"Bulk insert into {table} failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < attempts:
+                    self._count('retries')
+                    # Interruptible so shutdown does not wait out the backoff
+                    if self._stop_event.wait(self.backoff * (2 ** attempt)):
+                        break
+        return rows
+
+    def _split(self, table: str, rows: List[dict], attempts: int, error: Exception) -> List[dict]:
+        """Halve a rejected batch until the bad rows are alone, then set them aside."""
+        if len(rows) == 1:
+            logger.error(f"Supabase rejected a row for {table}, moving it to {self._rejected_path(table)}: {error}")
+            self._spill(table, rows, rejected=True)
+            return []
+        middle = len(rows) // 2
+        pending = self._write(table, rows[:middle], attempts)
+        if pending:
+            # Unreachable again; leave the second half for the spill file too
+            return pending + rows[middle:]
+        return self._write(table, rows[middle:], attempts)
+
+    def _spill_path(self, table: str) -> str:
+        return os.path.join(self.spill_dir, f"{table}.jsonl")
+
+    def _rejected_path(self, table: str) -> str:
+        return os.path.join(self.spill_dir, 'rejected', f"{table}.jsonl")
+
+    def _spill(self, table: str, rows: List[dict], rejected: bool = False) -> bool:
+        path = self._rejected_path(table) if rejected else self._spill_path(table)
+        try:
+            # One line per row, written in a single call so a crash leaves at most one partial line
+            data = ''.join(json.dumps(row, default=str) + '\n' for row in rows)
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'a') as f:
+                    f.write(data)
+            self._count('rejected' if rejected else 'spilled', len(rows))
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Failed to spill {len(rows)} rows for {table}, dropping them: {e}")
+            return False
+
+    def _replay_spill(self):
+        if not os.path.isdir(self.spill_dir):
+            return
+
+        tables = set()
+        for name in os.listdir(self.spill_dir):
+            if name.endswith('.jsonl'):
+                tables.add(name[:-len('.jsonl')])
+            elif name.endswith('.jsonl.replay'):
+                tables.add(name[:-len('.jsonl.replay')])
+
+        for table in sorted(tables):
+            try:
+                self._replay_table(table)
+            except Exception as e:
+                logger.error(f"Replaying spilled rows for {table} failed: {e}")
+
+    def _replay_table(self, table: str):
+        path = self._spill_path(table)
+        replay_path = path + '.replay'
+
+        # Move the file aside so rows spilled during the replay are not lost or duplicated.
+        # A .replay file left behind by an interrupted pass is finished first.
+        if not os.path.exists(replay_path):
+            with self._spill_lock:
+                try:
+                    os.replace(path, replay_path)
+                except FileNotFoundError:
+                    return
+
+        rows = []
+        with open(replay_path) as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # Typically a line cut short by a crash during _spill
+                    logger.error(f"Skipping unreadable spilled row {number} for {table}")
+
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            rejected = self.stats['rejected']
+            pending = self._write(table, batch, 1)
+            if pending:
+                # Still unreachable; put the rest back and try again later
+                rest = pending + rows[start + self.batch_size:]
+                if self._spill(table, rest):
+                    self._count('spilled', -len(rest))
+                    os.remove(replay_path)
+                return
+            self._count('replayed', len(batch) - (self.stats['rejected'] - rejected))
+
+        os.remove(replay_path)
+        logger.info(f"Replayed {len(rows)} spilled rows into {table}")
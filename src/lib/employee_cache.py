@@ -0,0 +1,109 @@
+import copy
+import logging
+import threading
+import time
+
+import face_codec
+from face_index import build_matcher
+
+logger = logging.getLogger(__name__)
+
+
+class EmployeeCache:
+    """Employee face matcher refreshed by cursor_column and swapped in whole, so readers never block.
+
+    A full reload every full_reload_interval seconds drops deleted employees.
+    """
+
+    def __init__(self, client, refresh_interval: float = 60.0, matcher_options: dict = None,
+                 cursor_column: str = 'updated_at', full_reload_interval: float = 600.0):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.matcher_options = matcher_options or {}
+        self.cursor_column = cursor_column
+        self.full_reload_interval = full_reload_interval
+        self.columns = ', '.join(dict.fromkeys(['employee_id', 'name', 'face_encoding', 'created_at', cursor_column]))
+        self.matcher = None
+        self.cursor = None
+        self.versions = {}  # employee_id -> cursor value of the row the matcher holds
+        self.last_refresh = 0.0
+        self.last_full_reload = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def get(self):
+        """Return the current matcher snapshot, scheduling a refresh when it is stale."""
+        if self.matcher is None:
+            # First use has nothing to fall back on, so load synchronously once
+            with self._refresh_lock:
+                if self.matcher is None:
+                    self._reload_locked()
+        elif time.time() - self.last_refresh > self.refresh_interval and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return self.matcher
+
+    def _decode(self, rows):
+        rows = [row for row in rows if row.get('face_encoding')]
+        matrix, ok = face_codec.decode_many([row['face_encoding'] for row in rows])
+        for row in [row for i, row in enumerate(rows) if not ok[i]]:
+            logger.error(f"Skipping employee {row.get('employee_id')} with unreadable encoding")
+        return [{**row, "face_encoding": matrix[i]} for i, row in enumerate(rows) if ok[i]]
+
+    def _track(self, rows):
+        for row in rows:
+            self.versions[row['employee_id']] = row.get(self.cursor_column)
+        timestamps = [row[self.cursor_column] for row in rows if row.get(self.cursor_column)]
+        if timestamps:
+            self.cursor = max([self.cursor or ''] + timestamps)
+
+    def reload(self):
+        """Rebuild the matcher from the full table and swap it in."""
+        with self._refresh_lock:
+            return self._reload_locked()
+
+    def _reload_locked(self):
+        response = self.client.table('employees').select(self.columns).execute()
+        all_rows = response.data or []
+        matcher = build_matcher(self._decode(all_rows), **self.matcher_options)
+        dropped = set(self.versions) - {row['employee_id'] for row in all_rows}
+        self.cursor = None
+        self.versions = {}
+        self._track(all_rows)
+        self.matcher = matcher
+        self.last_refresh = self.last_full_reload = time.time()
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} deleted employees")
+        logger.info(f"Loaded {len(matcher)} employee encodings")
+        return len(matcher)
+
+    def refresh(self):
+        """Apply employees changed since the last cursor to a copy of the matcher, then swap it in."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if time.time() - self.last_full_reload > self.full_reload_interval:
+                self._reload_locked()
+                return
+            query = self.client.table('employees').select(self.columns)
+            if self.cursor:
+                # gte, so rows sharing the cursor timestamp are not missed; versions skips the ones already applied
+                query = query.gte(self.cursor_column, self.cursor)
+            response = query.order(self.cursor_column).execute()
+            # Rows come oldest first, so the last row per employee is the newest
+            latest = {row['employee_id']: row for row in response.data or []}
+            changed = [row for employee_id, row in latest.items()
+                       if employee_id not in self.versions or self.versions[employee_id] != row.get(self.cursor_column)]
+            if changed:
+                matcher = copy.deepcopy(self.matcher)
+                for row in changed:
+                    # Re-enrolled employees replace their old encoding; cleared ones just disappear
+                    matcher.remove(row['employee_id'])
+                for row in self._decode(changed):
+                    matcher.add(row['employee_id'], row['name'], row['face_encoding'])
+                self.matcher = matcher
+                self._track(changed)
+                logger.info(f"Applied {len(changed)} changed employee encodings")
+        except Exception as e:
+            logger.error(f"Employee cache refresh failed: {e}")
+        finally:
+            self.last_refresh = time.time()
+            self._refresh_lock.release()
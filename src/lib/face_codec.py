@@ -0,0 +1,121 @@
+import base64
+import io
+import logging
+import pickle
+import struct
+
+import numpy as np
+
+from face_index import ENCODING_DIM
+
+logger = logging.getLogger(__name__)
+
+# Version 1 layout: 8-byte header (magic, version, dim) + dim little-endian float32
+MAGIC = b'FENC'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+RECORD = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('dim', '<u2'),
+    ('data', '<f4', (ENCODING_DIM,)),
+])
+
+
+def _b64decode(text: str) -> bytes:
+    # Older rows were sometimes stored without padding
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Only rebuilds numpy arrays, so legacy rows cannot run arbitrary code."""
+
+    ALLOWED = {
+        ('numpy', 'ndarray'),
+        ('numpy', 'dtype'),
+        ('numpy.core.multiarray', '_reconstruct'),
+        ('numpy._core.multiarray', '_reconstruct'),
+        ('numpy.core.numeric', '_frombuffer'),
+        ('numpy._core.numeric', '_frombuffer'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to unpickle {module}.{name}")
+        return super().find_class(module, name)
+
+
+def encode(encoding) -> str:
+    """Serialize a face encoding into the compact versioned format, as base64 text."""
+    data = np.asarray(encoding, dtype='<f4').reshape(ENCODING_DIM)
+    return base64.b64encode(HEADER.pack(MAGIC, VERSION, ENCODING_DIM) + data.tobytes()).decode('ascii')
+
+
+def is_legacy(text: str) -> bool:
+    """True if text is a base64 pickle written before the compact format existed."""
+    return not _b64decode(text).startswith(MAGIC)
+
+
+def decode(text: str) -> np.ndarray:
+    """Decode one face encoding in either the compact or the legacy pickle format."""
+    matrix, ok = decode_many([text])
+    if not ok[0]:
+        raise ValueError("Unreadable face encoding")
+    return matrix[0]
+
+
+def decode_many(texts):
+    """Decode many encodings into an (n, ENCODING_DIM) float32 matrix.
+
+    Compact rows are decoded together with a single np.frombuffer; legacy
+    pickled rows fall back to a restricted unpickler one at a time. Returns
+    (matrix, ok) where ok marks the rows that could be decoded; the others
+    are left as zeros.
+    """
+    matrix = np.zeros((len(texts), ENCODING_DIM), dtype=np.float32)
+    ok = np.zeros(len(texts), dtype=bool)
+    compact_rows, compact_blobs = [], []
+
+    for i, text in enumerate(texts):
+        try:
+            blob = _b64decode(text)
+        except Exception as e:
+            logger.error(f"Failed to decode base64 face encoding: {e}")
+            continue
+        if blob.startswith(MAGIC) and len(blob) == RECORD.itemsize:
+            compact_rows.append(i)
+            compact_blobs.append(blob)
+            continue
+        try:
+            matrix[i] = np.asarray(_LegacyUnpickler(io.BytesIO(blob)).load(), dtype=np.float32).reshape(ENCODING_DIM)
+            ok[i] = True
+        except Exception as e:
+            logger.error(f"Failed to decode legacy face encoding: {e}")
+
+    if compact_rows:
+        records = np.frombuffer(b''.join(compact_blobs), dtype=RECORD)
+        valid = (records['version'] == VERSION) & (records['dim'] == ENCODING_DIM)
+        rows = np.asarray(compact_rows)
+        matrix[rows[valid]] = records['data'][valid]
+        ok[rows[valid]] = True
+    return matrix, ok
+
+
+def migrate_encodings(client, table: str = 'employees') -> int:
+    """Rewrite legacy pickled encodings in table to the compact format; returns the number migrated."""
+    response = client.table(table).select('employee_id, face_encoding').execute()
+    migrated = 0
+    for row in response.data or []:
+        text = row.get('face_encoding')
+        if not text:
+            continue
+        try:
+            # Malformed base64 raises here too; skip that row rather than abort the migration
+            if not is_legacy(text):
+                continue
+            client.table(table).update({'face_encoding': encode(decode(text))}) \
+                .eq('employee_id', row['employee_id']).execute()
+            migrated += 1
+        except Exception as e:
+            logger.error(f"Failed to migrate encoding for employee {row['employee_id']}: {e}")
+    return migrated
@@ -0,0 +1,79 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+
+# Same res10 SSD setup as merged.py
+SSD_PROTOTXT = os.getenv("FACE_SSD_PROTOTXT", "deploy.prototxt")
+SSD_MODEL = os.getenv("FACE_SSD_MODEL", "res10_300x300_ssd_iter_140000_fp16.caffemodel")
+SSD_INPUT_SIZE = (300, 300)
+SSD_MEAN = (104, 117, 123)
+
+
+class FaceDetector:
+    """Face detector trading speed for accuracy: 'hog' on a frame downscaled by scale, or the 'ssd' model.
+
+    Boxes are face_recognition (top, right, bottom, left) tuples on the full frame.
+    """
+
+    def __init__(self, method: str = 'hog', scale: float = 1.0, ssd_confidence: float = 0.7,
+                 ssd_prototxt: str = SSD_PROTOTXT, ssd_model: str = SSD_MODEL):
+        if method not in ('hog', 'ssd'):
+            raise ValueError(f"Unknown face detection method: {method}")
+        if not 0 < scale <= 1:
+            raise ValueError(f"Detection scale must be in (0, 1], got {scale}")
+        self.method = method
+        self.scale = scale
+        self.ssd_confidence = ssd_confidence
+        self.net = cv2.dnn.readNetFromCaffe(ssd_prototxt, ssd_model) if method == 'ssd' else None
+        self._lock = threading.Lock()  # cv2.dnn nets are not safe to share across threads
+
+    def options(self) -> dict:
+        """Constructor arguments that recreate this detector, e.g. in a worker process."""
+        return {'method': self.method, 'scale': self.scale, 'ssd_confidence': self.ssd_confidence}
+
+    def detect(self, rgb_frame):
+        """Return face boxes as (top, right, bottom, left) in full-frame pixels."""
+        if self.method == 'ssd':
+            return self._detect_ssd(rgb_frame)
+        return self._detect_hog(rgb_frame)
+
+    def _detect_hog(self, rgb_frame):
+        if self.scale == 1:
+            return face_recognition.face_locations(rgb_frame, model="hog")
+
+        small = cv2.resize(rgb_frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        height, width = rgb_frame.shape[:2]
+        return [
+            (
+                max(0, int(top / self.scale)),
+                min(width, int(right / self.scale)),
+                min(height, int(bottom / self.scale)),
+                max(0, int(left / self.scale)),
+            )
+            for top, right, bottom, left in face_recognition.face_locations(small, model="hog")
+        ]
+
+    def _detect_ssd(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        # The model was trained on BGR input, hence swapRB for our RGB frames
+        blob = cv2.dnn.blobFromImage(rgb_frame, 1.0, SSD_INPUT_SIZE, SSD_MEAN, swapRB=True, crop=False)
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+
+        locations = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.ssd_confidence:
+                continue
+            left, top, right, bottom = detections[0, 0, i, 3:7]
+            box = (
+                max(0, int(top * height)),
+                min(width, int(right * width)),
+                min(height, int(bottom * height)),
+                max(0, int(left * width)),
+            )
+            if box[2] > box[0] and box[1] > box[3]:
+                locations.append(box)
+        return locations
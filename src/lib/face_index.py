@@ -0,0 +1,254 @@
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+def _as_matrix(encodings) -> np.ndarray:
+    return np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM))
+
+
+def _sq_norms(matrix: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', matrix, matrix)
+
+
+def _sq_distances(queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distances via ||q - e||^2 = ||q||^2 + ||e||^2 - 2 q.e."""
+    sq_dist = _sq_norms(queries)[:, None] + sq_norms[None, :] - 2.0 * queries @ matrix.T
+    return np.maximum(sq_dist, 0.0, out=sq_dist)
+
+
+def _top_k(sq_dist: np.ndarray, k: int):
+    """Return (sq_distances, columns) of the k smallest entries per row, nearest first."""
+    if k < sq_dist.shape[1]:
+        columns = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(sq_dist.shape[1]), sq_dist.shape).copy()
+    top = np.take_along_axis(sq_dist, columns, axis=1)
+    order = np.argsort(top, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(columns, order, axis=1)
+
+
+class FaceMatcher:
+    """Interface shared by the exact and approximate matchers.
+
+    Subclasses keep ids and names indexable by the positions search()
+    returns, and support add()/remove() so enrolment changes do not need a
+    full rebuild.
+    """
+
+    ids: np.ndarray
+    names: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs):
+        """Build a matcher from employee rows whose face_encoding is already decoded."""
+        return cls(
+            [row['employee_id'] for row in rows],
+            [row['name'] for row in rows],
+            [row['face_encoding'] for row in rows] or np.empty((0, ENCODING_DIM)),
+            **kwargs
+        )
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def search(self, queries, k: int = 1):
+        raise NotImplementedError
+
+    def add(self, employee_id, name, encoding):
+        raise NotImplementedError
+
+    def remove(self, employee_id):
+        raise NotImplementedError
+
+    def match(self, queries, threshold: float = 0.55, k: int = 1):
+        """Return, per query, up to k employees closer than threshold, nearest first."""
+        # search() pads with index -1 when fewer than k candidates exist
+        distances, indices = self.search(queries, k)
+        return [
+            [
+                {'employee_id': self.ids[i], 'name': self.names[i], 'distance': float(d)}
+                for d, i in zip(row_d, row_i) if i >= 0 and d < threshold
+            ]
+            for row_d, row_i in zip(distances, indices)
+        ]
+
+
+class EmbeddingStore(FaceMatcher):
+    """Exact face matcher over a contiguous float32 embedding matrix.
+
+    Row i of matrix is the encoding of the employee ids[i] / names[i]. All
+    faces in a frame are matched with a single matrix product, which gives
+    the same Euclidean distance face_recognition.face_distance computes one
+    face at a time.
+    """
+
+    def __init__(self, ids, names, encodings):
+        # Object arrays keep IDs as the Python values they came in as, at any length
+        self.ids = np.asarray(ids, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.matrix = _as_matrix(encodings)
+        self.sq_norms = _sq_norms(self.matrix)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, queries, k: int = 1):
+        """Return (distances, indices), each shaped (n_queries, k), nearest first."""
+        queries = _as_matrix(queries)
+        k = min(k, len(self))
+        if k == 0 or len(queries) == 0:
+            return np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64)
+
+        sq_dist, indices = _top_k(_sq_distances(queries, self.matrix, self.sq_norms), k)
+        return np.sqrt(sq_dist), indices
+
+    def add(self, employee_id, name, encoding):
+        encoding = _as_matrix(encoding)
+        self.ids = np.append(self.ids, np.array([employee_id], dtype=object))
+        self.names = np.append(self.names, np.array([name], dtype=object))
+        self.matrix = np.ascontiguousarray(np.vstack([self.matrix, encoding]))
+        self.sq_norms = np.append(self.sq_norms, _sq_norms(encoding))
+
+    def remove(self, employee_id):
+        keep = self.ids != employee_id
+        self.ids = self.ids[keep]
+        self.names = self.names[keep]
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.sq_norms = self.sq_norms[keep]
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; returns the (n_clusters, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmin(_sq_distances(data, centroids, _sq_norms(centroids)), axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so every list stays usable
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()))]
+    return centroids
+
+
+class IVFIndex(FaceMatcher):
+    """Approximate matcher over k-means partitions; n_probe trades recall for speed.
+
+    add()/remove() reuse slots without retraining; call retrain() after large changes.
+    """
+
+    def __init__(self, ids, names, encodings, n_lists: int = None, n_probe: int = 8,
+                 kmeans_iter: int = 10, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iter = kmeans_iter
+        self.seed = seed
+        self._build(np.asarray(ids, dtype=object), np.asarray(names, dtype=object), _as_matrix(encodings))
+
+    def _build(self, ids, names, matrix):
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(matrix))))
+        n_lists = max(1, min(n_lists, len(matrix)))
+        if len(matrix):
+            # Training on a sample keeps rebuilds cheap on large galleries
+            rng = np.random.default_rng(self.seed)
+            sample = matrix[rng.choice(len(matrix), min(len(matrix), 256 * n_lists), replace=False)]
+            self.centroids = kmeans(sample, n_lists, self.kmeans_iter, self.seed)
+        else:
+            self.centroids = np.zeros((1, ENCODING_DIM), np.float32)
+        self.centroid_norms = _sq_norms(self.centroids)
+
+        self.ids = ids.copy()
+        self.names = names.copy()
+        self.matrix = matrix.copy()
+        self.sq_norms = _sq_norms(self.matrix)
+        self.alive = np.ones(len(matrix), dtype=bool)
+        self.free_slots = []
+
+        assignment = self._assign(self.matrix)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def _assign(self, matrix: np.ndarray) -> np.ndarray:
+        if len(matrix) == 0:
+            return np.empty(0, np.int64)
+        return np.argmin(_sq_distances(matrix, self.centroids, self.centroid_norms), axis=1)
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def retrain(self):
+        """Re-cluster the live encodings from scratch."""
+        self._build(self.ids[self.alive], self.names[self.alive], self.matrix[self.alive])
+
+    def search(self, queries, k: int = 1, n_probe: int = None):
+        """Return (distances, slots), each shaped (n_queries, k), nearest first.
+
+        Rows are padded with inf / -1 when fewer than k candidates were scanned.
+        """
+        queries = _as_matrix(queries)
+        k = min(k, len(self))
+        distances = np.full((len(queries), k), np.inf, np.float32)
+        slots = np.full((len(queries), k), -1, np.int64)
+        if k == 0 or len(queries) == 0:
+            return distances, slots
+
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        coarse = _sq_distances(queries, self.centroids, self.centroid_norms)
+        probes = np.argpartition(coarse, n_probe - 1, axis=1)[:, :n_probe]
+
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([self.lists[i] for i in lists])
+            if len(candidates) == 0:
+                continue
+            sq_dist = _sq_distances(queries[q:q + 1], self.matrix[candidates], self.sq_norms[candidates])
+            top, columns = _top_k(sq_dist, min(k, len(candidates)))
+            distances[q, :top.shape[1]] = np.sqrt(top[0])
+            slots[q, :top.shape[1]] = candidates[columns[0]]
+        return distances, slots
+
+    def add(self, employee_id, name, encoding):
+        encoding = _as_matrix(encoding)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.ids[slot] = employee_id
+            self.names[slot] = name
+            self.matrix[slot] = encoding[0]
+            self.sq_norms[slot] = _sq_norms(encoding)[0]
+            self.alive[slot] = True
+        else:
+            slot = len(self.matrix)
+            self.ids = np.append(self.ids, np.array([employee_id], dtype=object))
+            self.names = np.append(self.names, np.array([name], dtype=object))
+            self.matrix = np.vstack([self.matrix, encoding])
+            self.sq_norms = np.append(self.sq_norms, _sq_norms(encoding))
+            self.alive = np.append(self.alive, True)
+
+        list_id = self._assign(encoding)[0]
+        self.lists[list_id] = np.append(self.lists[list_id], slot)
+
+    def remove(self, employee_id):
+        removed = np.flatnonzero(self.alive & (self.ids == employee_id))
+        if len(removed) == 0:
+            return
+        self.alive[removed] = False
+        self.free_slots.extend(removed.tolist())
+        for list_id in np.unique(self._assign(self.matrix[removed])):
+            self.lists[list_id] = self.lists[list_id][self.alive[self.lists[list_id]]]
+
+
+MATCHERS = {
+    'exact': EmbeddingStore,
+    'ivf': IVFIndex,
+}
+
+
+def build_matcher(rows, kind: str = 'exact', **kwargs) -> FaceMatcher:
+    """Build the matcher named by kind ('exact' or 'ivf') from decoded employee rows."""
+    if kind not in MATCHERS:
+        raise ValueError(f"Unknown face matcher: {kind}")
+    return MATCHERS[kind].from_rows(rows, **kwargs)
@@ -0,0 +1,114 @@
+import itertools
+
+
+def box_iou(a, b) -> float:
+    """IoU of two face_recognition (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if not inter:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centroid(box):
+    top, right, bottom, left = box
+    return (left + right) / 2.0, (top + bottom) / 2.0
+
+
+class Track:
+    """One face followed across processed frames of a camera."""
+
+    def __init__(self, track_id: int, box):
+        self.track_id = track_id
+        self.box = box
+        self.missed = 0
+        self.identity = None  # Best employee match, or None for an unknown face
+        self.verified = False
+        self.verified_box = None
+        self.frames_since_verify = 0
+
+
+class FaceTracker:
+    """IoU/centroid tracker so each face is encoded once, not once per frame.
+
+    A track is re-identified when new, every reverify_every frames, or when its box drifts.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, centroid_factor: float = 0.5, max_missed: int = 3,
+                 reverify_every: int = 15, retry_unknown_every: int = 3, reverify_iou: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.centroid_factor = centroid_factor
+        self.max_missed = max_missed
+        self.reverify_every = reverify_every
+        self.retry_unknown_every = retry_unknown_every
+        self.reverify_iou = reverify_iou
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """Match this frame's boxes to tracks; returns the track for each box, in order."""
+        assigned = [None] * len(boxes)
+        free_tracks = set(range(len(self.tracks)))
+
+        # Greedy matching on IoU, best pairs first
+        pairs = sorted(
+            ((box_iou(track.box, box), t, b)
+             for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True
+        )
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in free_tracks and assigned[b] is None:
+                assigned[b] = self.tracks[t]
+                free_tracks.discard(t)
+
+        # Centroid fallback for boxes that moved too far to overlap
+        for b, box in enumerate(boxes):
+            if assigned[b] is not None:
+                continue
+            cx, cy = _centroid(box)
+            best, best_dist = None, None
+            for t in free_tracks:
+                track = self.tracks[t]
+                tx, ty = _centroid(track.box)
+                dist = ((cx - tx) ** 2 + (cy - ty) ** 2) ** 0.5
+                limit = self.centroid_factor * (track.box[1] - track.box[3])
+                if dist <= limit and (best_dist is None or dist < best_dist):
+                    best, best_dist = t, dist
+            if best is not None:
+                assigned[b] = self.tracks[best]
+                free_tracks.discard(best)
+
+        for t in free_tracks:
+            self.tracks[t].missed += 1
+
+        for b, box in enumerate(boxes):
+            track = assigned[b]
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+                assigned[b] = track
+            track.box = box
+            track.missed = 0
+            track.frames_since_verify += 1
+
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        return assigned
+
+    def needs_identity(self, track: Track) -> bool:
+        if not track.verified:
+            return True
+        interval = self.reverify_every if track.identity else self.retry_unknown_every
+        if track.frames_since_verify >= interval:
+            return True
+        return box_iou(track.box, track.verified_box) < self.reverify_iou
+
+    def set_identity(self, track: Track, identity):
+        track.identity = identity
+        track.verified = True
+        track.verified_box = track.box
+        track.frames_since_verify = 0
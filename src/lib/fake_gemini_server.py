@@ -0,0 +1,93 @@
+"""Local stand-in for the Gemini generateContent REST API, for load and failure testing.
+
+Every request is answered with --answer after --delay seconds (plus up to
+--jitter). The peak number of concurrent requests is logged, so
+GEMINI_MAX_CONCURRENCY and GEMINI_DEADLINE can be checked without quota.
+
+Usage: python fake_gemini_server.py --port 8900 --delay 1.5
+       GEMINI_API_ENDPOINT=http://localhost:8900 python camera-server.py
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    answer = "No fire detected"
+    delay = 0.5
+    jitter = 0.0
+    status = 200
+    active = 0
+    peak = 0
+    served = 0
+    last_request = None
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cls = type(self)
+        with cls.lock:
+            cls.last_request = {'path': self.path, 'api_key': self.headers.get('x-goog-api-key'),
+                                'body': json.loads(body or b'{}')}
+            cls.active += 1
+            if cls.active > cls.peak:
+                cls.peak = cls.active
+                logging.info(f"Peak concurrency {cls.peak}")
+        try:
+            time.sleep(cls.delay + random.uniform(0, cls.jitter))
+            if cls.status != 200:
+                body = {'error': {'code': cls.status, 'message': 'Fake failure', 'status': 'UNAVAILABLE'}}
+            else:
+                body = {
+                    'candidates': [{
+                        'content': {'parts': [{'text': cls.answer}], 'role': 'model'},
+                        'finishReason': 'STOP',
+                        'index': 0,
+                    }],
+                    'usageMetadata': {'promptTokenCount': 0, 'candidatesTokenCount': 0, 'totalTokenCount': 0},
+                }
+            payload = json.dumps(body).encode()
+            self.send_response(cls.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+                cls.served += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--answer', default=FakeGemini.answer)
+    parser.add_argument('--delay', type=float, default=FakeGemini.delay, help="Seconds before each response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random delay, up to this many seconds")
+    parser.add_argument('--status', type=int, default=200, help="HTTP status to return, e.g. 503 to test failures")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    FakeGemini.answer = args.answer
+    FakeGemini.delay = args.delay
+    FakeGemini.jitter = args.jitter
+    FakeGemini.status = args.status
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), FakeGemini)
+    logging.info(f"Fake Gemini listening on port {args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info(f"Served {FakeGemini.served} requests, peak concurrency {FakeGemini.peak}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Flame colours in OpenCV HSV (hue 0-179): red through yellow, saturated and bright
+FLAME_HUE_MAX = 35
+FLAME_SATURATION_MIN = 80
+FLAME_VALUE_MIN = 180
+FLAME_RED_MIN = 190
+
+
+class FireScreen:
+    """Local, CPU-only fire score in [0, 1] from flame colour, flicker and growth.
+
+    Frames below threshold need not go to the model; the score also serves as a degraded verdict.
+    """
+
+    def __init__(self, threshold: float = 0.3, alarm_threshold: float = 0.7, min_area: float = 0.001,
+                 full_area: float = 0.02, history: int = 6, width: int = 160):
+        self.threshold = threshold
+        self.alarm_threshold = alarm_threshold
+        self.min_area = min_area
+        self.full_area = full_area
+        self.width = width
+        self.masks = deque(maxlen=history)
+        self.last_score = 0.0
+        self.screened = 0
+        self.escalated = 0
+        self.degraded = 0
+
+    def flame_mask(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        hsv_mask = cv2.inRange(hsv, (0, FLAME_SATURATION_MIN, FLAME_VALUE_MIN), (FLAME_HUE_MAX, 255, 255)) > 0
+
+        blue, green, red = small[..., 0], small[..., 1], small[..., 2]
+        rgb_mask = (red >= FLAME_RED_MIN) & (red > green) & (green > blue)
+        return hsv_mask & rgb_mask
+
+    def score(self, frame) -> float:
+        mask = self.flame_mask(frame)
+        self.masks.append(mask)
+        area = np.count_nonzero(mask) / float(mask.size)
+
+        if area < self.min_area or len(self.masks) < 2 or self.masks[0].shape != mask.shape:
+            self.last_score = 0.0 if area < self.min_area else min(1.0, area / self.full_area) * 0.5
+            return self.last_score
+
+        masks = np.stack(self.masks)
+        # Flames flicker: count pixels that change state between consecutive masks
+        toggled = np.count_nonzero(masks[1:] ^ masks[:-1])
+        union = np.count_nonzero(masks[1:] | masks[:-1])
+        flicker = toggled / union if union else 0.0
+
+        first_area = np.count_nonzero(masks[0]) / float(mask.size)
+        growth = (area - first_area) / max(first_area, self.min_area)
+
+        coverage = min(1.0, area / self.full_area)
+        self.last_score = float(0.5 * coverage + 0.3 * min(1.0, flicker / 0.3) + 0.2 * np.clip(growth, 0.0, 1.0))
+        return self.last_score
+
+    def should_escalate(self, frame) -> bool:
+        """Score frame and return True if it is worth asking the model."""
+        if self.score(frame) >= self.threshold:
+            self.escalated += 1
+            return True
+        self.screened += 1
+        return False
+
+    def verdict(self) -> str:
+        """Local answer for the last frame, for use when the model cannot be reached."""
+        self.degraded += 1
+        if self.last_score >= self.alarm_threshold:
+            return "Fire detected (local)"
+        return "Possible fire (local)" if self.last_score >= self.threshold else "No fire detected (local)"
+
+    def stats(self) -> dict:
+        checked = self.screened + self.escalated
+        return {
+            'last_score': round(self.last_score, 3),
+            'screened': self.screened,
+            'escalated': self.escalated,
+            'degraded': self.degraded,
+            'escalation_rate': round(self.escalated / checked, 3) if checked else None,
+        }
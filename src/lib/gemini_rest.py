@@ -0,0 +1,71 @@
+import httpx
+
+DEFAULT_ENDPOINT = "https://generativelanguage.googleapis.com"
+
+
+class GeminiError(Exception):
+    """Gemini answered with an HTTP error or without a usable candidate."""
+
+
+def text_part(text: str) -> dict:
+    return {"text": text}
+
+
+def image_part(image_base64: str) -> dict:
+    return {"inlineData": {"mimeType": "image/jpeg", "data": image_base64}}
+
+
+class GeminiRestModel:
+    """Gemini generateContent over REST, on one pooled async HTTP client.
+
+    endpoint may point at fake_gemini_server.py. The HTTP client is created on
+    first use, so it belongs to the event loop that calls generate().
+    """
+
+    def __init__(self, api_key: str, model: str = "gemini-1.5-flash-latest", endpoint: str = None,
+                 temperature: float = 0.1, timeout: float = 30.0):
+        self.api_key = api_key
+        self.model = model
+        self.url = f"{(endpoint or DEFAULT_ENDPOINT).rstrip('/')}/v1beta/models/{model}:generateContent"
+        self.temperature = temperature
+        self.timeout = timeout
+        self._http = None
+
+    async def generate(self, parts, system: str = None) -> str:
+        """Send one user turn made of parts and return the answer text."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.timeout, headers={'x-goog-api-key': self.api_key})
+        body = {
+            'contents': [{'role': 'user', 'parts': parts}],
+            'generationConfig': {'temperature': self.temperature},
+        }
+        if system:
+            body['systemInstruction'] = {'parts': [text_part(system)]}
+
+        response = await self._http.post(self.url, json=body)
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200:
+            error = data.get('error') if isinstance(data, dict) else None
+            message = error.get('message') if isinstance(error, dict) else response.reason_phrase
+            raise GeminiError(f"HTTP {response.status_code}: {message}")
+
+        candidates = data.get('candidates') or []
+        if not candidates:
+            reason = (data.get('promptFeedback') or {}).get('blockReason', 'empty response')
+            raise GeminiError(f"no candidates ({reason})")
+        return ''.join(part.get('text', '') for part in candidates[0].get('content', {}).get('parts', []))
+
+
+class PromptChain:
+    """One question about one image: ainvoke({'prompt', 'image_base64'}) returns the answer text."""
+
+    def __init__(self, model: GeminiRestModel, system: str = None):
+        self.model = model
+        self.system = system
+
+    async def ainvoke(self, inputs: dict) -> str:
+        return await self.model.generate([text_part(inputs['prompt']), image_part(inputs['image_base64'])],
+                                         self.system)
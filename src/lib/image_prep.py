@@ -0,0 +1,84 @@
+import base64
+
+import cv2
+
+
+class ImagePrep:
+    """Crops, downscales and JPEG-encodes frames for Assistant requests.
+
+    roi is (x, y, width, height) fractions; with max_bytes, quality drops until the JPEG fits.
+    """
+
+    def __init__(self, max_side: int = 1024, quality: int = 80, roi=None, max_bytes: int = None,
+                 min_quality: int = 30):
+        if max_side is not None and max_side <= 0:
+            raise ValueError(f"max_side must be positive, got {max_side}")
+        if not 1 <= min_quality <= quality <= 100:
+            raise ValueError(f"Need 1 <= min_quality <= quality <= 100, got {min_quality} and {quality}")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        if roi is not None:
+            x, y, width, height = (float(v) for v in roi)
+            if not (0 <= x < 1 and 0 <= y < 1 and 0 < width <= 1 - x and 0 < height <= 1 - y):
+                raise ValueError(f"roi must be (x, y, width, height) fractions inside the frame, got {roi}")
+            roi = (x, y, width, height)
+        self.max_side = max_side
+        self.quality = quality
+        self.roi = roi
+        self.max_bytes = max_bytes
+        self.min_quality = min_quality
+        self.last_quality = quality
+        self.last_bytes = 0
+
+    def crop(self, frame):
+        if self.roi is None:
+            return frame
+        height, width = frame.shape[:2]
+        x, y, w, h = self.roi
+        return frame[int(y * height):int((y + h) * height), int(x * width):int((x + w) * width)]
+
+    def resize(self, frame):
+        height, width = frame.shape[:2]
+        if not self.max_side or max(height, width) <= self.max_side:
+            return frame
+        scale = self.max_side / max(height, width)
+        return cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame) -> bytes:
+        """Crop, resize and JPEG-encode frame within the configured limits."""
+        image = self.resize(self.crop(frame))
+        quality = self.quality
+        jpeg = _jpeg(image, quality)
+
+        if self.max_bytes and len(jpeg) > self.max_bytes:
+            # Largest quality that fits; fall back to min_quality if nothing does
+            low, high = self.min_quality, quality - 1
+            best = None
+            while low <= high:
+                middle = (low + high) // 2
+                candidate = _jpeg(image, middle)
+                if len(candidate) <= self.max_bytes:
+                    best, quality = candidate, middle
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            if best is None:
+                quality = self.min_quality
+                best = _jpeg(image, quality)
+            jpeg = best
+
+        self.last_quality = quality
+        self.last_bytes = len(jpeg)
+        return jpeg
+
+    def prepare(self, frame) -> str:
+        """Base64 JPEG payload for Assistant.answer."""
+        return base64.b64encode(self.encode(frame)).decode('ascii')
+
+
+def _jpeg(image, quality: int) -> bytes:
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class DeadlineExceeded(Exception):
+    """A model call got no response within its deadline.
+
+    Deliberately not a TimeoutError: since Python 3.11 that is also
+    concurrent.futures.TimeoutError, which callers catch for their own waits.
+    """
+
+
+class InferenceClient:
+    """Runs model calls as coroutines on one background event loop.
+
+    Callers on any thread submit a runnable and its input and get a
+    concurrent.futures.Future back, so no thread is parked per in-flight
+    request. At most max_concurrency calls run at once; the rest wait for a
+    slot. Each request has a deadline (default timeout seconds) that covers
+    the wait for a slot and the call itself. Models are created once and
+    reused, so their HTTP connections are pooled across requests.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, runnable, inputs, timeout: float = None) -> Future:
+        return asyncio.run_coroutine_threadsafe(
+            self._call(runnable, inputs, self.timeout if timeout is None else timeout), self.loop
+        )
+
+    async def _call(self, runnable, inputs, timeout: float):
+        self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(self._limited(runnable, inputs), timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded(f"no response within {timeout}s")
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def _limited(self, runnable, inputs):
+        async with self.semaphore:
+            return await runnable.ainvoke(inputs)
+
+    def stats(self) -> dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+        }
@@ -0,0 +1,142 @@
+import threading
+import time
+from typing import Dict
+
+
+class InferencePipeline:
+    """Inference stage of a camera's capture -> inference pipeline.
+
+    The capture stage is the CameraManager reader, which always overwrites
+    the subscriber slot with the newest frame. This stage pulls whatever is
+    newest when it becomes free, so anything decoded while a slow model call
+    was running is dropped rather than queued.
+    """
+
+    def __init__(self, camera_id: str, model_type: str):
+        self.camera_id = camera_id
+        self.model_type = model_type
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_gated = 0  # Analysed by the motion gate only
+        self.last_seq = None
+        self.queue_lag = 0.0  # Age of a frame when inference picked it up
+        self.inference_lag = 0.0  # Age of a frame when its result was ready
+        self.inference_time = 0.0
+        self._lock = threading.Lock()
+
+    def on_frame(self, seq: int, captured_at: float):
+        with self._lock:
+            if self.last_seq is not None and seq > self.last_seq + 1:
+                self.frames_dropped += seq - self.last_seq - 1
+            self.last_seq = seq
+            self.queue_lag = time.time() - captured_at
+
+    def on_gated(self):
+        with self._lock:
+            self.frames_gated += 1
+
+    def on_result(self, captured_at: float, started_at: float):
+        now = time.time()
+        with self._lock:
+            self.frames_processed += 1
+            self.inference_time = now - started_at
+            self.inference_lag = now - captured_at
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'model_type': self.model_type,
+                'frames_processed': self.frames_processed,
+                'frames_dropped': self.frames_dropped,
+                'frames_gated': self.frames_gated,
+                'queue_lag': round(self.queue_lag, 3),
+                'inference_time': round(self.inference_time, 3),
+                'inference_lag': round(self.inference_lag, 3),
+            }
+
+
+class FrameScheduler:
+    """Paces each camera's analysed frames so pipelines share cpu_budget cores max-min fairly.
+
+    unregister() needs the token register() returned, so a stopping worker cannot drop its successor.
+    """
+
+    def __init__(self, cpu_budget: float, smoothing: float = 0.2):
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+        self.pipelines: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def register(self, camera_id: str, model_type: str, target_fps: float):
+        token = object()
+        with self._lock:
+            self.pipelines[camera_id] = {
+                'token': token,
+                'model_type': model_type,
+                'target_fps': target_fps,
+                'cost': 0.0,  # Smoothed CPU seconds per analysed frame
+                'share': None,  # Cores allotted by the last rebalance
+                'interval': 1.0 / target_fps,
+                'next_due': 0.0,
+            }
+            self._rebalance()
+        return token
+
+    def unregister(self, camera_id: str, token):
+        with self._lock:
+            pipeline = self.pipelines.get(camera_id)
+            if pipeline is None or pipeline['token'] is not token:
+                return
+            del self.pipelines[camera_id]
+            self._rebalance()
+
+    def wait_time(self, camera_id: str) -> float:
+        """Seconds until the camera should analyse its next frame."""
+        pipeline = self.pipelines.get(camera_id)
+        return max(0.0, pipeline['next_due'] - time.time()) if pipeline else 0.0
+
+    def record(self, camera_id: str, started_at: float, cpu_seconds: float):
+        with self._lock:
+            pipeline = self.pipelines.get(camera_id)
+            if pipeline is None:
+                return
+            if pipeline['cost']:
+                pipeline['cost'] += self.smoothing * (cpu_seconds - pipeline['cost'])
+            else:
+                pipeline['cost'] = cpu_seconds
+            self._rebalance()
+            pipeline['next_due'] = started_at + pipeline['interval']
+
+    def skip(self, camera_id: str, started_at: float):
+        """Advance the schedule for a frame rejected before the model ran, without touching its cost."""
+        with self._lock:
+            pipeline = self.pipelines.get(camera_id)
+            if pipeline:
+                pipeline['next_due'] = started_at + pipeline['interval']
+
+    def _rebalance(self):
+        # Max-min fair split: satisfy the smallest demands first
+        remaining = self.cpu_budget
+        by_demand = sorted(self.pipelines.values(), key=lambda p: p['cost'] * p['target_fps'])
+        for index, pipeline in enumerate(by_demand):
+            demand = pipeline['cost'] * pipeline['target_fps']
+            share = min(demand, remaining / (len(by_demand) - index))
+            remaining -= share
+            pipeline['share'] = share
+            min_interval = 1.0 / pipeline['target_fps']
+            if pipeline['cost'] and share > 0:
+                pipeline['interval'] = max(min_interval, pipeline['cost'] / share)
+            else:
+                pipeline['interval'] = min_interval
+
+    def stats(self, camera_id: str) -> dict:
+        with self._lock:
+            pipeline = self.pipelines.get(camera_id)
+            if pipeline is None:
+                return None
+            return {
+                'target_fps': pipeline['target_fps'],
+                'effective_fps': round(1.0 / pipeline['interval'], 2),
+                'cpu_per_frame': round(pipeline['cost'], 4),
+                'cpu_share': round(pipeline['share'] or 0.0, 3),
+            }
@@ -3,7 +3,6 @@ import sys
 import time
 import queue
 import threading
-import base64
 import os
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema.messages import SystemMessage
@@ -12,6 +11,9 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from fire_screen import FireScreen
+from image_prep import ImagePrep
+
 # Configure logging
 import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -65,6 +67,7 @@ class WebcamStream:
         self.running = False
         self.lock = threading.Lock()
         self.frame_ready = threading.Event()
+        self.image_prep = ImagePrep(max_side=1024, quality=70)  # Gemini does not need full webcam resolution
 
     def start(self):
         if self.running:
@@ -100,8 +103,7 @@ class WebcamStream:
             with self.lock:
                 frame = self.frame_queue.get_nowait()
                 if encode and frame is not None:
-                    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                    return base64.b64encode(buffer).decode('utf-8')
+                    return self.image_prep.prepare(frame)
                 return frame
         except queue.Empty:
             return None
@@ -227,6 +229,7 @@ def main():
 
     webcam_stream = WebcamStream().start()
     assistant = Assistant()
+    fire_screen = FireScreen()
 
     last_detection_time = 0
 
@@ -242,6 +245,9 @@ def main():
         # Resize the frame to the desired display size
         frame = cv2.resize(frame, (display_width, display_height))
 
+        # Screen for flames before the logo is drawn over the corner
+        fire_candidate = fire_detection_running and fire_screen.should_escalate(frame)
+
         # Overlay the logo on the frame (top-left corner)
         frame = overlay_logo(frame, logo)
 
@@ -269,10 +275,15 @@ def main():
         fire_detection_result = ""
         if fire_detection_running:
             current_time = time.time()
-            if current_time - last_detection_time >= 0.5:
+            if not fire_candidate:
+                # No flame-like pixels, so there is nothing to ask Gemini about
+                fire_detection_result = "No Fire"
+            elif current_time - last_detection_time >= 0.5:
                 encoded_frame = webcam_stream.read(encode=True)
                 if encoded_frame is not None:
                     response = assistant.answer(encoded_frame, """You are a fire detection assistant. Analyze the provided image to determine if there is any fire. Respond with 'Fire' or 'No Fire'.""", "fire")
+                    if response and (response.startswith("Error") or response == "Model not initialized"):
+                        response = fire_screen.verdict()
                     if response:
                         logging.info(f"Fire Detection Response: {response}")
                         fire_detection_result = response
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class MetadataCache:
+    """TTL cache for single-row lookups such as cameras and models by ID.
+
+    loader(key) returns None for missing rows; misses are kept for negative_ttl.
+    """
+
+    def __init__(self, loader: Callable, ttl: float = 60.0, negative_ttl: float = 10.0, max_entries: int = 1024):
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0  # Bumped by invalidate() so loads racing it are not stored
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        cache_key = str(key)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None and now < entry[1]:
+                self.entries.move_to_end(cache_key)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self.generation
+
+        # Load outside the lock so one slow query does not stall other lookups
+        value = self.loader(key)
+        with self._lock:
+            if generation != self.generation:
+                return value
+            self.entries[cache_key] = (value, time.time() + (self.ttl if value is not None else self.negative_ttl))
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None) -> int:
+        """Drop key, or every entry when key is None; returns the number dropped."""
+        with self._lock:
+            if key is None:
+                dropped = len(self.entries)
+                self.entries.clear()
+            else:
+                dropped = 1 if self.entries.pop(str(key), None) is not None else 0
+            self.invalidations += dropped
+            self.generation += 1
+            return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,48 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap change detector in front of the expensive model stages.
+
+    Static scenes still pass one frame every keyframe_interval seconds.
+    """
+
+    def __init__(self, threshold: float = 0.01, pixel_delta: int = 25, keyframe_interval: float = 30.0,
+                 width: int = 160, learning_rate: float = 0.05):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.keyframe_interval = keyframe_interval
+        self.width = width
+        self.learning_rate = learning_rate
+        self.background = None
+        self.last_pass = 0.0
+        self.last_score = 0.0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame, now: float = None) -> bool:
+        """Return True if frame should go on to the model stage."""
+        now = time.time() if now is None else now
+        gray = self._thumbnail(frame)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.last_pass = now
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        self.last_score = np.count_nonzero(diff > self.pixel_delta) / float(diff.size)
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+        if self.last_score >= self.threshold or now - self.last_pass >= self.keyframe_interval:
+            self.last_pass = now
+            return True
+        return False
@@ -0,0 +1,59 @@
+import threading
+import time
+from typing import Dict
+
+
+class PresenceTracker:
+    """Collapses repeated attendance sightings into check-in events, per camera and employee.
+
+    A gesture must be confirmed within confirm_window and differ from the session's last one.
+    """
+
+    def __init__(self, cooldown: float = 30.0, confirm_window: float = 2.0,
+                 min_confirmations: int = 2, session_timeout: float = 300.0):
+        self.cooldown = cooldown
+        self.confirm_window = confirm_window
+        self.min_confirmations = min_confirmations
+        self.session_timeout = session_timeout
+        self.sessions: Dict[tuple, dict] = {}
+        self.last_prune = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, camera_id: str, employee_id, gesture: str, now: float = None):
+        """Record a sighting and return the gesture to log, or None if nothing changed."""
+        now = time.time() if now is None else now
+        key = (camera_id, employee_id)
+        if now - self.last_prune > self.session_timeout:
+            self.prune(now)
+
+        with self._lock:
+            session = self.sessions.get(key)
+            if session is None or now - session['last_seen'] > self.session_timeout:
+                session = {'logged_gesture': None, 'logged_at': None, 'sightings': []}
+                self.sessions[key] = session
+            session['last_seen'] = now
+
+            # Keep only sightings of this gesture inside the confirmation window
+            session['sightings'] = [
+                (t, g) for t, g in session['sightings']
+                if g == gesture and now - t <= self.confirm_window
+            ] + [(now, gesture)]
+            if len(session['sightings']) < self.min_confirmations:
+                return None
+
+            if gesture == session['logged_gesture']:
+                return None
+            if session['logged_at'] is not None and now - session['logged_at'] < self.cooldown:
+                return None
+
+            session['logged_gesture'] = gesture
+            session['logged_at'] = now
+            return gesture
+
+    def prune(self, now: float = None):
+        """Drop sessions that have timed out."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.last_prune = now
+            for key in [k for k, v in self.sessions.items() if now - v['last_seen'] > self.session_timeout]:
+                del self.sessions[key]
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+
+
+class Skipped:
+    """Outcome of a request that was never sent to the model.
+
+    It is not a verdict, so callers must not store it as a negative result.
+    """
+
+    def __repr__(self):
+        return "SKIPPED"
+
+
+SKIPPED = Skipped()
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, with bursts of up to capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class FairLimiter:
+    """Token bucket whose tokens are handed out round-robin across cameras.
+
+    Waiting requests are queued per camera, and the camera at the head of the
+    rotation gets the next token and then moves to the back. One busy
+    camera therefore cannot starve the others. A request that cannot get a
+    token within max_wait seconds gives up, since a newer frame will follow.
+    """
+
+    def __init__(self, rate: float, burst: float, max_wait: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_wait = max_wait
+        self.waiting = {}  # camera_id -> deque of tickets
+        self.order = deque()  # Cameras with waiting tickets, next turn first
+        self.granted = 0
+        self.skipped = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, camera_id) -> bool:
+        ticket = object()
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            if camera_id not in self.waiting:
+                self.waiting[camera_id] = deque()
+                self.order.append(camera_id)
+            self.waiting[camera_id].append(ticket)
+
+            while True:
+                head = self.order[0]
+                if self.waiting[head][0] is ticket and self.bucket.try_acquire():
+                    self._remove(camera_id, ticket, rotate=True)
+                    self.granted += 1
+                    self._cond.notify_all()
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(camera_id, ticket, rotate=False)
+                    self.skipped += 1
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(min(remaining, max(self.bucket.time_until_available(), 0.001)))
+
+    def _remove(self, camera_id, ticket, rotate: bool):
+        tickets = self.waiting[camera_id]
+        tickets.remove(ticket)
+        if rotate or not tickets:
+            self.order.remove(camera_id)
+            if tickets:
+                self.order.append(camera_id)
+            else:
+                del self.waiting[camera_id]
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'granted': self.granted,
+                'skipped': self.skipped,
+                'waiting': sum(len(t) for t in self.waiting.values()),
+            }
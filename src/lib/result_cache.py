@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Dict
+
+import cv2
+import numpy as np
+
+
+def dhash(frame, size: int = 8) -> int:
+    """64-bit difference hash of a BGR or grayscale frame.
+
+    Each bit says whether a pixel of a (size + 1) x size grayscale thumbnail
+    is brighter than its right-hand neighbour, so small shifts in exposure,
+    compression noise and sensor grain leave most bits unchanged.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class PerceptualCache:
+    """Per-camera, per-model cache of detection verdicts keyed by perceptual hash.
+
+    A lookup hits when a verdict younger than ttl seconds was stored for a
+    frame whose hash is within max_distance bits of the new one, so a
+    near-duplicate frame reuses the last answer instead of another LLM call.
+    """
+
+    def __init__(self, max_distance: int = 5, ttl: float = 5.0, max_entries: int = 8):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: Dict[tuple, list] = {}  # (camera_id, model_type) -> [(hash, verdict, stored_at)]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, camera_id: str, model_type: str, frame_hash: int, now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = [e for e in self.entries.get((camera_id, model_type), []) if now - e[2] <= self.ttl]
+            self.entries[(camera_id, model_type)] = entries
+            best = min(entries, key=lambda e: hamming(e[0], frame_hash), default=None)
+            if best is not None and hamming(best[0], frame_hash) <= self.max_distance:
+                self.hits += 1
+                return best[1]
+            self.misses += 1
+            return None
+
+    def put(self, camera_id: str, model_type: str, frame_hash: int, verdict: str, now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = self.entries.setdefault((camera_id, model_type), [])
+            entries.append((frame_hash, verdict, now))
+            del entries[:-self.max_entries]
+
+    def clear(self, camera_id: str):
+        with self._lock:
+            for key in [k for k in self.entries if k[0] == camera_id]:
+                del self.entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MJPEG_HEADERS = [
+    (b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+    (b'access-control-allow-origin', b'*'),
+    (b'cache-control', b'no-cache'),
+]
+
+
+class Channel:
+    """Latest encoded frame of one camera, shared by all of its viewers."""
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.version = 0  # Frames published so far
+        self.chunk = None
+        self.viewers = 0
+        self.closed = False
+        self.updated = asyncio.Event()
+
+    def publish(self, chunk: bytes):
+        self.version += 1
+        self.chunk = chunk
+        # Wake everyone waiting on the current event and start a fresh one
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    def close(self):
+        self.closed = True
+        self.updated.set()
+
+    async def wait_newer(self, version: int):
+        """Wait for a frame newer than version; returns (version, chunk), chunk None once closed."""
+        while self.version == version and not self.closed:
+            await self.updated.wait()
+        return self.version, None if self.closed else self.chunk
+
+
+class StreamHub:
+    """Async MJPEG fan-out for the ASGI mode; each viewer gets the newest frame, never a backlog.
+
+    Viewers stalled for stall_timeout are dropped; beyond max_streams new ones get 503.
+    """
+
+    def __init__(self, camera_manager, get_rtsp_url, max_streams: int = 500, stall_timeout: float = 10.0,
+                 max_cameras: int = 64):
+        self.camera_manager = camera_manager
+        self.get_rtsp_url = get_rtsp_url
+        self.max_streams = max_streams
+        self.stall_timeout = stall_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_cameras + 4, thread_name_prefix='mjpeg')
+        self.channels = {}
+        self.streams = 0
+        self.rejected = 0
+        self.slow_disconnects = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    async def __call__(self, scope, receive, send, camera_id: str):
+        if self.streams >= self.max_streams:
+            self.rejected += 1
+            await _respond(send, 503, {'error': 'Too many streams'})
+            return
+
+        self.streams += 1
+        try:
+            loop = asyncio.get_running_loop()
+            rtsp_url = await loop.run_in_executor(self.executor, self.get_rtsp_url, camera_id)
+            if not rtsp_url:
+                await _respond(send, 404, {'error': 'Camera not found'})
+                return
+            await self._stream(receive, send, self._join(camera_id, rtsp_url))
+        finally:
+            self.streams -= 1
+
+    def _join(self, camera_id: str, rtsp_url: str) -> Channel:
+        channel = self.channels.get(camera_id)
+        if channel is None:
+            channel = self.channels[camera_id] = Channel(camera_id)
+            asyncio.ensure_future(self._pump(channel, rtsp_url))
+        channel.viewers += 1
+        return channel
+
+    async def _stream(self, receive, send, channel: Channel):
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': MJPEG_HEADERS})
+            version = channel.version
+            while True:
+                next_frame = asyncio.ensure_future(channel.wait_newer(version))
+                await asyncio.wait({next_frame, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    next_frame.cancel()
+                    return
+
+                newest, chunk = next_frame.result()
+                if chunk is None:
+                    return
+                if version:
+                    self.frames_dropped += newest - version - 1
+                version = newest
+
+                try:
+                    await asyncio.wait_for(
+                        send({'type': 'http.response.body', 'body': chunk, 'more_body': True}),
+                        self.stall_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.slow_disconnects += 1
+                    logger.info(f"Dropping stalled viewer of camera {channel.camera_id}")
+                    return
+                self.frames_sent += 1
+        except OSError:
+            # Client went away mid-write
+            return
+        finally:
+            disconnected.cancel()
+            channel.viewers -= 1
+
+    async def _pump(self, channel: Channel, rtsp_url: str):
+        loop = asyncio.get_running_loop()
+        camera_id = channel.camera_id
+        subscriber_id, frames = await loop.run_in_executor(
+            self.executor, self.camera_manager.subscribe, camera_id, rtsp_url
+        )
+        if subscriber_id is None:
+            logger.error(f"Failed to open camera {camera_id} with RTSP URL: {rtsp_url}")
+            self._close(channel)
+            return
+
+        try:
+            while channel.viewers:
+                try:
+                    item = await loop.run_in_executor(self.executor, frames.get, True, 1.0)
+                except queue.Empty:
+                    if not self.camera_manager.is_running(camera_id):
+                        break
+                    continue
+                if item is None:
+                    logger.error(f"Stream for camera {camera_id} stopped")
+                    break
+
+                seq, frame, _ = item
+                _, chunk = await loop.run_in_executor(
+                    self.executor, self.camera_manager.get_jpeg, camera_id, seq, frame
+                )
+                if chunk is None:
+                    logger.error(f"Failed to encode frame from camera {camera_id}")
+                    break
+                channel.publish(chunk)
+        finally:
+            # Close before any await, so no viewer can join a channel that is going away
+            self._close(channel)
+            self.camera_manager.unsubscribe(camera_id, subscriber_id)
+
+    def _close(self, channel: Channel):
+        channel.close()
+        if self.channels.get(channel.camera_id) is channel:
+            del self.channels[channel.camera_id]
+
+    def stats(self) -> dict:
+        return {
+            'streams': self.streams,
+            'max_streams': self.max_streams,
+            'cameras': {camera_id: channel.viewers for camera_id, channel in list(self.channels.items())},
+            'rejected': self.rejected,
+            'slow_disconnects': self.slow_disconnects,
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+        }
+
+
+def create_asgi_app(hub: StreamHub, fallback):
+    """ASGI app serving /video_feed/<camera_id> from hub and everything else from fallback.
+
+    fallback is typically the Flask app wrapped with asgiref's WsgiToAsgi.
+    """
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    hub.executor.shutdown(wait=False)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        path = scope.get('path', '')
+        if scope['type'] == 'http' and scope['method'] == 'GET' and path.startswith('/video_feed/'):
+            camera_id = path[len('/video_feed/'):].strip('/')
+            if camera_id and '/' not in camera_id:
+                await hub(scope, receive, send, camera_id)
+                return
+        await fallback(scope, receive, send)
+
+    return app
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _respond(send, status: int, body: dict):
+    payload = json.dumps(body).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]})
+    await send({'type': 'http.response.body', 'body': payload})
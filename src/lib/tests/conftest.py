@@ -0,0 +1,24 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# Server modules import each other as top-level modules, e.g. `from assistant import Assistant`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini_server import FakeGemini  # noqa: E402
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """fake_gemini_server.py on a free local port; yields its base URL."""
+    for name, value in {'answer': "No fire detected", 'delay': 0.0, 'jitter': 0.0, 'status': 200,
+                        'active': 0, 'peak': 0, 'served': 0, 'last_request': None}.items():
+        monkeypatch.setattr(FakeGemini, name, value)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
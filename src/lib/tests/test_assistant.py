@@ -0,0 +1,131 @@
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from assistant import SKIPPED, Assistant, BatchRequest, RequestBatcher
+from fake_gemini_server import FakeGemini
+
+
+def make_assistant(**options):
+    options = {'rate': 100, 'burst': 10, 'max_wait': 0.05, 'max_batch': 1, **options}
+    return Assistant(fire_model=FakeListChatModel(responses=["No fire detected"]),
+                     helmet_model=FakeListChatModel(responses=["Helmet detected"]), **options)
+
+
+def test_answer_returns_model_verdict():
+    assistant = make_assistant()
+
+    assert assistant.answer("aW1hZ2U=", "Is there a fire?", "fire", "cam") == "No fire detected"
+    assert assistant.answer("aW1hZ2U=", "Is there a helmet?", "helmet", "cam") == "Helmet detected"
+
+
+def test_rate_limited_request_is_skipped():
+    assistant = make_assistant(rate=0.01, burst=1)
+
+    assert assistant.answer("aW1hZ2U=", "Is there a fire?", "fire", "cam") == "No fire detected"
+    assert assistant.answer("aW1hZ2U=", "Is there a fire?", "fire", "cam") is SKIPPED
+    assert assistant.stats()['fire']['skipped'] == 1
+
+
+BATCH_ANSWER = '[{"image": 1, "answer": "first"}, {"image": 2, "answer": "second"}, {"image": 3, "answer": "third"}]'
+
+
+class FakeClient:
+    """Answers every call at once with the same numbered batch response."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def submit(self, runnable, inputs):
+        self.calls += 1
+        future = Future()
+        future.set_result(BATCH_ANSWER)
+        return future
+
+
+class OpenLimiter:
+    def acquire(self, camera_id):
+        return True
+
+
+def make_batcher(**options):
+    options = {'max_batch': 3, 'max_wait': 0.05, **options}
+    return RequestBatcher(FakeClient(), None, {'fire': None}, OpenLimiter(), **options)
+
+
+def make_request(camera_id):
+    return BatchRequest("aW1hZ2U=", "Is there a fire?", "fire", camera_id)
+
+
+def test_batch_members_are_taken_round_robin():
+    batcher = make_batcher()
+    requests = [make_request(camera_id) for camera_id in ('busy', 'busy', 'busy', 'quiet')]
+    with batcher._cond:  # Hold the dispatcher until everything is queued; the lock is reentrant
+        for request in requests:
+            batcher.submit(request)
+
+    assert requests[0].future.result(timeout=1) == "first"
+    assert requests[3].future.result(timeout=1) == "second"
+    assert requests[1].future.result(timeout=1) == "third"
+    assert requests[2].future.result(timeout=1) == BATCH_ANSWER
+    assert batcher.client.calls == 2
+
+
+def test_cancelled_requests_are_not_sent():
+    batcher = make_batcher()
+    given_up, waiting = make_request('a'), make_request('b')
+    with batcher._cond:
+        batcher.submit(given_up)
+        batcher.submit(waiting)
+        given_up.future.cancel()
+
+    assert waiting.future.result(timeout=1) == BATCH_ANSWER
+    assert batcher.stats()['cancelled'] == 1
+    assert batcher.stats()['requests'] == 1
+
+
+def test_full_queue_skips_the_cameras_oldest_request():
+    batcher = make_batcher(max_queue=2)
+    oldest, older, newest, quiet = [make_request(camera_id) for camera_id in ('busy', 'busy', 'busy', 'quiet')]
+    with batcher._cond:
+        for request in (oldest, older, newest, quiet):
+            batcher.submit(request)
+        assert oldest.future.result(timeout=0) is SKIPPED
+        assert quiet.future.result(timeout=0) is SKIPPED
+
+    assert older.future.result(timeout=1) == "first"
+    assert newest.future.result(timeout=1) == "second"
+    assert batcher.stats()['dropped'] == 2
+
+
+def test_missed_deadline_is_an_error_not_skipped():
+    assistant = Assistant(fire_model=FakeListChatModel(responses=["No fire detected"], sleep=1),
+                          helmet_model=FakeListChatModel(responses=["Helmet detected"]),
+                          rate=100, burst=10, max_wait=0.05, max_batch=1, deadline=0.05)
+
+    response = assistant.answer("aW1hZ2U=", "Is there a fire?", "fire", "cam")
+
+    assert response is not SKIPPED
+    assert response.startswith("Error: no response within")
+    assert assistant.stats()['client']['timed_out'] == 1
+
+
+def test_env_configured_models_reach_the_endpoint(fake_gemini, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_ENDPOINT", fake_gemini)
+    monkeypatch.setenv("GOOGLE_API_KEY_FIRE", "fire-key")
+    monkeypatch.setenv("GOOGLE_API_KEY_HELMET", "helmet-key")
+    assistant = Assistant(rate=100, burst=10, max_wait=0.05, max_batch=2, batch_wait=0.05)
+
+    assert assistant.answer("aW1hZ2U=", "Is there a fire?", "fire", "cam") == "No fire detected"
+    assert FakeGemini.last_request['api_key'] == "fire-key"
+
+    FakeGemini.answer = '[{"image": 1, "answer": "Fire"}, {"image": 2, "answer": "No fire"}]'
+    with assistant.batchers['fire']._cond:
+        first = assistant.submit("aW1hZ2U=", "Is there a fire?", "fire", "a")
+        second = assistant.submit("aW1hZ2U=", "Is there a fire?", "fire", "b")
+    assert (first.result(timeout=5), second.result(timeout=5)) == ("Fire", "No fire")
+    assert FakeGemini.last_request['body']['contents'][0]['parts'][0]['text'].startswith("You will receive 2 images")
@@ -0,0 +1,216 @@
+import json
+import os
+import time
+
+from db_writer import SupabaseWriter
+
+
+class FakeAPIError(Exception):
+    """Shaped like postgrest's APIError, which carries the PostgREST/Postgres error code."""
+
+    def __init__(self, code: str):
+        super().__init__(f"error {code}")
+        self.code = code
+
+
+class FakeSupabase:
+    """Stand-in for supabase-py's table(name).insert(rows).execute() chain."""
+
+    def __init__(self, failures: int = 0, poison=(), failure_code: str = None):
+        self.failures = failures  # Calls to fail before succeeding
+        self.failure_code = failure_code  # Fail with this API error code instead of a connection error
+        self.poison = set(poison)  # Values of 'n' whose rows violate a constraint
+        self.calls = 0
+        self.inserted = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.rows = None
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.calls += 1
+        if self.client.failures:
+            self.client.failures -= 1
+            if self.client.failure_code:
+                raise FakeAPIError(self.client.failure_code)
+            raise ConnectionError("Supabase unreachable")
+        if any(row.get('n') in self.client.poison for row in self.rows):
+            raise FakeAPIError('23503')  # foreign_key_violation
+        self.client.inserted.setdefault(self.table, []).append(list(self.rows))
+
+
+def make_writer(client, tmp_path, **options):
+    options = {'batch_size': 3, 'flush_interval': 60, 'backoff': 0.001, 'spill_dir': str(tmp_path),
+               'replay_interval': 60, **options}
+    return SupabaseWriter(client, **options)
+
+
+def spilled_rows(tmp_path, table):
+    with open(os.path.join(tmp_path, f"{table}.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_flush_sends_bulk_inserts_per_table(tmp_path):
+    client = FakeSupabase()
+    writer = make_writer(client, tmp_path)
+    for i in range(4):
+        writer.insert('fire_detections', {'n': i})
+    writer.insert('helmet_violations', {'n': 0})
+
+    writer.flush()
+
+    assert client.inserted['fire_detections'] == [[{'n': 0}, {'n': 1}, {'n': 2}], [{'n': 3}]]
+    assert client.inserted['helmet_violations'] == [[{'n': 0}]]
+    assert writer.stats['written'] == 5
+    assert writer.stats['batches'] == 3
+
+
+def test_writer_thread_flushes_full_batches_and_on_stop(tmp_path):
+    client = FakeSupabase()
+    writer = make_writer(client, tmp_path).start()
+    for i in range(3):
+        writer.insert('attendance_logs', {'n': i})
+
+    deadline = time.time() + 2
+    while 'attendance_logs' not in client.inserted and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.inserted['attendance_logs'] == [[{'n': 0}, {'n': 1}, {'n': 2}]]
+
+    writer.insert('attendance_logs', {'n': 3})
+    writer.stop()
+    assert client.inserted['attendance_logs'][-1] == [{'n': 3}]
+
+
+def test_failed_insert_is_retried_with_backoff(tmp_path):
+    client = FakeSupabase(failures=2)
+    writer = make_writer(client, tmp_path, max_retries=3)
+    writer.insert('fire_detections', {'n': 1})
+
+    writer.flush()
+
+    assert client.calls == 3
+    assert writer.stats['retries'] == 2
+    assert client.inserted['fire_detections'] == [[{'n': 1}]]
+    assert not os.path.exists(os.path.join(tmp_path, 'fire_detections.jsonl'))
+
+
+def test_spill_and_replay_round_trip(tmp_path):
+    client = FakeSupabase(failures=3)
+    writer = make_writer(client, tmp_path, max_retries=3)
+    writer.insert('fire_detections', {'n': 1})
+    writer.insert('fire_detections', {'n': 2})
+
+    writer.flush()
+    assert spilled_rows(tmp_path, 'fire_detections') == [{'n': 1}, {'n': 2}]
+    assert writer.stats['spilled'] == 2
+
+    writer._replay_spill()
+    assert client.inserted['fire_detections'] == [[{'n': 1}, {'n': 2}]]
+    assert writer.stats['replayed'] == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_replay_puts_rows_back(tmp_path):
+    client = FakeSupabase(failures=1)
+    writer = make_writer(client, tmp_path)
+    writer._spill('fire_detections', [{'n': 1}])
+
+    writer._replay_spill()
+
+    assert spilled_rows(tmp_path, 'fire_detections') == [{'n': 1}]
+    assert writer.stats['spilled'] == 1
+    assert sorted(os.listdir(tmp_path)) == ['fire_detections.jsonl']
+
+
+def test_replay_skips_truncated_lines(tmp_path):
+    client = FakeSupabase()
+    writer = make_writer(client, tmp_path)
+    with open(os.path.join(tmp_path, 'fire_detections.jsonl'), 'w') as f:
+        f.write('{"n": 1}\n{"n": 2}\n{"n": ')
+
+    writer._replay_spill()
+
+    assert client.inserted['fire_detections'] == [[{'n': 1}, {'n': 2}]]
+    assert os.listdir(tmp_path) == []
+
+
+def test_leftover_replay_file_is_picked_up(tmp_path):
+    client = FakeSupabase()
+    writer = make_writer(client, tmp_path)
+    with open(os.path.join(tmp_path, 'attendance_logs.jsonl.replay'), 'w') as f:
+        f.write('{"n": 1}\n')
+
+    writer._replay_spill()
+
+    assert client.inserted['attendance_logs'] == [[{'n': 1}]]
+    assert os.listdir(tmp_path) == []
+
+
+def test_writer_survives_replay_errors(tmp_path):
+    client = FakeSupabase()
+    writer = make_writer(client, tmp_path, flush_interval=0.01, replay_interval=0.01)
+    # A directory where the spill file should be makes every replay attempt fail
+    os.makedirs(os.path.join(tmp_path, 'fire_detections.jsonl.replay'))
+    writer.start()
+    time.sleep(0.1)
+
+    writer.insert('helmet_violations', {'n': 1})
+    writer.stop()
+
+    assert client.inserted['helmet_violations'] == [[{'n': 1}]]
+
+
+def rejected_rows(tmp_path, table):
+    with open(os.path.join(tmp_path, 'rejected', f"{table}.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_poison_row_is_set_aside_and_the_rest_written(tmp_path):
+    client = FakeSupabase(poison={2})
+    writer = make_writer(client, tmp_path, batch_size=4)
+    for i in range(4):
+        writer.insert('attendance_logs', {'n': i})
+
+    writer.flush()
+
+    written = [row for batch in client.inserted['attendance_logs'] for row in batch]
+    assert sorted(row['n'] for row in written) == [0, 1, 3]
+    assert rejected_rows(tmp_path, 'attendance_logs') == [{'n': 2}]
+    assert writer.stats['rejected'] == 1
+    assert writer.stats['spilled'] == 0
+    assert not os.path.exists(os.path.join(tmp_path, 'attendance_logs.jsonl'))
+
+
+def test_poison_row_does_not_block_replay(tmp_path):
+    client = FakeSupabase(poison={1})
+    writer = make_writer(client, tmp_path)
+    writer._spill('attendance_logs', [{'n': 0}, {'n': 1}, {'n': 2}, {'n': 3}])
+
+    writer._replay_spill()
+
+    written = [row for batch in client.inserted['attendance_logs'] for row in batch]
+    assert sorted(row['n'] for row in written) == [0, 2, 3]
+    assert rejected_rows(tmp_path, 'attendance_logs') == [{'n': 1}]
+    assert os.listdir(tmp_path) == ['rejected']
+    assert writer.stats['replayed'] == 3
+
+
+def test_transient_api_errors_are_spilled_not_rejected(tmp_path):
+    client = FakeSupabase(failures=3, failure_code='PGRST001')
+    writer = make_writer(client, tmp_path, max_retries=3)
+    writer.insert('fire_detections', {'n': 1})
+
+    writer.flush()
+
+    assert spilled_rows(tmp_path, 'fire_detections') == [{'n': 1}]
+    assert writer.stats['rejected'] == 0
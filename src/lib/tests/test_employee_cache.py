@@ -0,0 +1,115 @@
+import numpy as np
+
+import face_codec
+from employee_cache import EmployeeCache
+
+
+class FakeEmployees:
+    """Stand-in for supabase-py's employees select chain."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        assert name == 'employees'
+        return FakeSelect(self)
+
+
+class FakeSelect:
+    def __init__(self, client):
+        self.client = client
+        self.column = None
+        self.since = None
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        self.column = column
+        self.since = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.since)
+        rows = [r for r in self.client.rows if self.since is None or r[self.column] >= self.since]
+        return type('Response', (), {'data': rows})()
+
+
+def employee(employee_id, created_at, seed, updated_at=None):
+    encoding = np.random.default_rng(seed).normal(size=128).astype(np.float32)
+    row = {'employee_id': employee_id, 'name': f"E{employee_id}", 'face_encoding': face_codec.encode(encoding),
+           'created_at': created_at, 'updated_at': updated_at or created_at}
+    return row, encoding
+
+
+def test_refresh_adds_new_employees_to_a_new_snapshot():
+    first, first_encoding = employee(1, '2024-01-01T00:00:00', 1)
+    client = FakeEmployees([first])
+    cache = EmployeeCache(client, refresh_interval=60)
+
+    snapshot = cache.get()
+    assert len(snapshot) == 1
+
+    second, second_encoding = employee(2, '2024-01-02T00:00:00', 2)
+    client.rows.append(second)
+    cache.refresh()
+
+    assert client.queries[-1] == '2024-01-01T00:00:00'
+    assert len(snapshot) == 1  # Readers holding the old snapshot are unaffected
+    assert len(cache.matcher) == 2
+    match = cache.matcher.match([second_encoding], threshold=0.1)[0]
+    assert match[0]['employee_id'] == 2
+
+
+def test_unreadable_encodings_are_skipped():
+    good, _ = employee(1, '2024-01-01T00:00:00', 1)
+    bad = {'employee_id': 2, 'name': 'E2', 'face_encoding': 'not an encoding', 'created_at': '2024-01-01'}
+
+    cache = EmployeeCache(FakeEmployees([good, bad]))
+
+    assert cache.reload() == 1
+
+
+def test_refresh_replaces_re_enrolled_employee():
+    first, old_encoding = employee(1, '2024-01-01T00:00:00', 1)
+    client = FakeEmployees([first])
+    cache = EmployeeCache(client)
+    cache.get()
+
+    updated, new_encoding = employee(1, '2024-01-01T00:00:00', 2, updated_at='2024-01-03T00:00:00')
+    client.rows[0] = updated
+    cache.refresh()
+
+    assert len(cache.matcher) == 1
+    assert cache.matcher.match([old_encoding], threshold=0.1) == [[]]
+    assert cache.matcher.match([new_encoding], threshold=0.1)[0][0]['employee_id'] == 1
+
+
+def test_rows_at_the_cursor_are_applied_once():
+    row, _ = employee(1, '2024-01-01T00:00:00', 1)
+    client = FakeEmployees([row])
+    cache = EmployeeCache(client)
+    snapshot = cache.get()
+
+    cache.refresh()
+
+    assert client.queries[-1] == '2024-01-01T00:00:00'
+    assert cache.matcher is snapshot  # Nothing changed, so no new snapshot
+
+
+def test_periodic_full_reload_drops_deleted_employees():
+    kept, _ = employee(1, '2024-01-01T00:00:00', 1)
+    deleted, deleted_encoding = employee(2, '2024-01-02T00:00:00', 2)
+    client = FakeEmployees([kept, deleted])
+    cache = EmployeeCache(client, full_reload_interval=0)
+    cache.get()
+
+    client.rows.remove(deleted)
+    cache.refresh()
+
+    assert len(cache.matcher) == 1
+    assert cache.matcher.match([deleted_encoding], threshold=0.1) == [[]]
@@ -0,0 +1,102 @@
+import base64
+import io
+import pickle
+
+import numpy as np
+import pytest
+
+import face_codec
+from face_index import ENCODING_DIM
+
+
+def sample_encoding(seed=0):
+    return np.random.default_rng(seed).normal(size=ENCODING_DIM)
+
+
+def legacy(obj) -> str:
+    return base64.b64encode(pickle.dumps(obj)).decode('ascii')
+
+
+class Payload:
+    """Anything that is not a numpy array must be refused by the legacy unpickler."""
+
+    def __reduce__(self):
+        return (print, ("unpickled",))
+
+
+def test_round_trip_is_compact_float32():
+    encoding = sample_encoding()
+
+    text = face_codec.encode(encoding)
+
+    assert not face_codec.is_legacy(text)
+    assert len(base64.b64decode(text)) == face_codec.RECORD.itemsize
+    np.testing.assert_array_equal(face_codec.decode(text), encoding.astype(np.float32))
+
+
+def test_legacy_pickle_is_decoded():
+    encoding = sample_encoding(1)
+    text = legacy(encoding)
+
+    assert face_codec.is_legacy(text)
+    np.testing.assert_allclose(face_codec.decode(text), encoding, rtol=1e-6)
+
+
+def test_decode_many_marks_unreadable_rows():
+    texts = [face_codec.encode(sample_encoding(2)), legacy(sample_encoding(3)), 'abcde', legacy(Payload())]
+
+    matrix, ok = face_codec.decode_many(texts)
+
+    assert ok.tolist() == [True, True, False, False]
+    assert not matrix[2:].any()
+
+
+def test_restricted_unpickler_refuses_other_classes():
+    with pytest.raises(pickle.UnpicklingError):
+        face_codec._LegacyUnpickler(io.BytesIO(pickle.dumps(Payload()))).load()
+    with pytest.raises(ValueError):
+        face_codec.decode(legacy({'not': 'an array'}))
+
+
+class FakeTable:
+    """Stand-in for supabase-py's select and update().eq() chains on one table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = {}
+        self.pending = None
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        self.pending = None
+        return self
+
+    def update(self, values):
+        self.pending = values
+        return self
+
+    def eq(self, column, value):
+        self.pending = (value, self.pending)
+        return self
+
+    def execute(self):
+        if self.pending is None:
+            return type('Response', (), {'data': self.rows})()
+        employee_id, values = self.pending
+        self.updates[employee_id] = values['face_encoding']
+
+
+def test_migration_skips_malformed_rows():
+    encoding = sample_encoding(4)
+    client = FakeTable([
+        {'employee_id': 'bad', 'face_encoding': 'abcde'},
+        {'employee_id': 'old', 'face_encoding': legacy(encoding)},
+        {'employee_id': 'new', 'face_encoding': face_codec.encode(encoding)},
+        {'employee_id': 'none', 'face_encoding': None},
+    ])
+
+    assert face_codec.migrate_encodings(client) == 1
+    assert list(client.updates) == ['old']
+    np.testing.assert_array_equal(face_codec.decode(client.updates['old']), encoding.astype(np.float32))
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from face_index import ENCODING_DIM, EmbeddingStore, IVFIndex, build_matcher
+
+
+def encodings(count, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, ENCODING_DIM)).astype(np.float32)
+
+
+def make_matcher(kind, count=6):
+    gallery = encodings(count)
+    rows = [{'employee_id': f"e{i}", 'name': f"Employee {i}", 'face_encoding': gallery[i]} for i in range(count)]
+    options = {'n_lists': 2, 'n_probe': 2} if kind == 'ivf' else {}
+    return build_matcher(rows, kind, **options), gallery
+
+
+@pytest.mark.parametrize('kind', ['exact', 'ivf'])
+def test_match_finds_enrolled_employee(kind):
+    matcher, gallery = make_matcher(kind)
+
+    matches = matcher.match(gallery[[3, 5]])
+
+    assert [m[0]['employee_id'] for m in matches] == ['e3', 'e5']
+    assert matches[0][0]['name'] == 'Employee 3'
+    assert matches[0][0]['distance'] < 1e-3
+
+
+@pytest.mark.parametrize('kind', ['exact', 'ivf'])
+def test_removed_employee_no_longer_matches(kind):
+    matcher, gallery = make_matcher(kind)
+
+    matcher.remove('e3')
+
+    assert len(matcher) == 5
+    assert matcher.match(gallery[3:4]) == [[]]
+    assert matcher.match(gallery[4:5])[0][0]['employee_id'] == 'e4'
+
+
+@pytest.mark.parametrize('kind', ['exact', 'ivf'])
+def test_added_employee_keeps_full_id(kind):
+    matcher, _ = make_matcher(kind)
+    new_encoding = encodings(1, seed=1)[0]
+
+    # On the IVF index this reuses the freed slot of a much shorter ID
+    matcher.remove('e3')
+    matcher.add('employee-long-id-123', 'New Hire', new_encoding)
+
+    match = matcher.match(new_encoding[None])[0][0]
+    assert match['employee_id'] == 'employee-long-id-123'
+    assert match['name'] == 'New Hire'
+    assert len(matcher) == 6
+
+
+def test_ivf_retrain_keeps_live_rows_only():
+    matcher, gallery = make_matcher('ivf')
+    matcher.remove('e1')
+    matcher.add('e9', 'Employee 9', encodings(1, seed=2)[0])
+
+    matcher.retrain()
+
+    assert sorted(matcher.ids.tolist()) == ['e0', 'e2', 'e3', 'e4', 'e5', 'e9']
+    assert matcher.match(gallery[2:3])[0][0]['employee_id'] == 'e2'
+
+
+def test_exact_store_accepts_integer_ids():
+    store = EmbeddingStore([7, 8], ['a', 'b'], encodings(2))
+    assert store.match(encodings(2)[1:2])[0][0]['employee_id'] == 8
+    assert isinstance(IVFIndex([1], ['a'], encodings(1)).match(encodings(1))[0][0]['employee_id'], int)
@@ -0,0 +1,61 @@
+from concurrent.futures import wait
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fake_gemini_server import FakeGemini
+from gemini_rest import GeminiError, GeminiRestModel, PromptChain
+from inference_client import DeadlineExceeded, InferenceClient
+
+QUESTION = {'prompt': "Is there a fire?", 'image_base64': "aW1hZ2U="}
+
+
+def make_chain(endpoint):
+    return PromptChain(GeminiRestModel("test-key", endpoint=endpoint), "Be brief.")
+
+
+def test_verdict_comes_back_from_the_endpoint(fake_gemini):
+    client = InferenceClient(max_concurrency=2, timeout=5)
+
+    assert client.submit(make_chain(fake_gemini), QUESTION).result(timeout=5) == "No fire detected"
+
+    request = FakeGemini.last_request
+    assert request['path'] == "/v1beta/models/gemini-1.5-flash-latest:generateContent"
+    assert request['api_key'] == "test-key"
+    assert request['body']['contents'][0]['parts'] == [
+        {'text': "Is there a fire?"},
+        {'inlineData': {'mimeType': "image/jpeg", 'data': "aW1hZ2U="}},
+    ]
+    assert request['body']['systemInstruction'] == {'parts': [{'text': "Be brief."}]}
+
+
+def test_concurrent_calls_are_capped(fake_gemini):
+    FakeGemini.delay = 0.2
+    client = InferenceClient(max_concurrency=2, timeout=5)
+    chain = make_chain(fake_gemini)
+
+    futures = [client.submit(chain, QUESTION) for _ in range(6)]
+    wait(futures, timeout=5)
+
+    assert [future.result() for future in futures] == ["No fire detected"] * 6
+    assert FakeGemini.peak == 2
+    assert client.stats()['completed'] == 6
+
+
+def test_slow_endpoint_misses_the_deadline(fake_gemini):
+    FakeGemini.delay = 0.5
+    client = InferenceClient(max_concurrency=2, timeout=0.1)
+
+    with pytest.raises(DeadlineExceeded):
+        client.submit(make_chain(fake_gemini), QUESTION).result(timeout=5)
+    assert client.stats()['timed_out'] == 1
+
+
+def test_http_error_is_raised(fake_gemini):
+    FakeGemini.status = 503
+    client = InferenceClient(max_concurrency=2, timeout=5)
+
+    with pytest.raises(GeminiError, match="HTTP 503: Fake failure"):
+        client.submit(make_chain(fake_gemini), QUESTION).result(timeout=5)
+    assert client.stats()['failed'] == 1
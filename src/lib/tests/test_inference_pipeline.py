@@ -0,0 +1,40 @@
+from inference_pipeline import FrameScheduler, InferencePipeline
+
+
+def test_expensive_pipelines_share_the_budget():
+    scheduler = FrameScheduler(cpu_budget=1.0, smoothing=1.0)
+    scheduler.register('cheap', 'helmet', target_fps=2)
+    scheduler.register('heavy_a', 'attendance', target_fps=10)
+    scheduler.register('heavy_b', 'attendance', target_fps=10)
+
+    scheduler.record('cheap', 0.0, 0.01)
+    scheduler.record('heavy_a', 0.0, 0.2)
+    scheduler.record('heavy_b', 0.0, 0.2)
+
+    assert scheduler.stats('cheap')['effective_fps'] == 2
+    # 0.98 cores left, split evenly: 0.49 / 0.2 s per frame
+    assert scheduler.stats('heavy_a')['effective_fps'] == scheduler.stats('heavy_b')['effective_fps'] == 2.45
+
+
+def test_stale_token_cannot_unregister_the_next_worker():
+    scheduler = FrameScheduler(cpu_budget=1.0)
+    old_token = scheduler.register('cam', 'fire', target_fps=2)
+    scheduler.unregister('cam', old_token)
+    new_token = scheduler.register('cam', 'fire', target_fps=2)
+
+    scheduler.unregister('cam', old_token)
+    assert scheduler.stats('cam') is not None
+
+    scheduler.unregister('cam', new_token)
+    assert scheduler.stats('cam') is None
+
+
+def test_pipeline_counts_dropped_frames():
+    pipeline = InferencePipeline('cam', 'fire')
+    pipeline.on_frame(1, captured_at=0.0)
+    pipeline.on_frame(4, captured_at=0.0)
+    pipeline.on_gated()
+
+    stats = pipeline.stats()
+    assert stats['frames_dropped'] == 2
+    assert stats['frames_gated'] == 1
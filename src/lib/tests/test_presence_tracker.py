@@ -0,0 +1,26 @@
+from presence_tracker import PresenceTracker
+
+
+def test_gesture_needs_confirmation_and_logs_once():
+    tracker = PresenceTracker(cooldown=30, confirm_window=2, min_confirmations=2, session_timeout=300)
+
+    assert tracker.observe('cam', 1, 'thumb_up', now=0.0) is None
+    assert tracker.observe('cam', 1, 'thumb_up', now=0.5) == 'thumb_up'
+    assert tracker.observe('cam', 1, 'thumb_up', now=1.0) is None
+
+
+def test_changed_gesture_waits_for_cooldown():
+    tracker = PresenceTracker(cooldown=30, confirm_window=2, min_confirmations=1, session_timeout=300)
+
+    assert tracker.observe('cam', 1, 'thumb_up', now=0.0) == 'thumb_up'
+    assert tracker.observe('cam', 1, 'thumb_down', now=10.0) is None
+    assert tracker.observe('cam', 1, 'thumb_down', now=31.0) == 'thumb_down'
+
+
+def test_new_session_after_timeout():
+    tracker = PresenceTracker(cooldown=30, confirm_window=2, min_confirmations=1, session_timeout=60)
+
+    assert tracker.observe('cam', 1, 'thumb_up', now=0.0) == 'thumb_up'
+    assert tracker.observe('cam', 1, 'thumb_up', now=100.0) == 'thumb_up'
+    tracker.prune(now=200.0)
+    assert tracker.sessions == {}
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from rate_limit import FairLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=1000, capacity=2)
+
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    time.sleep(0.01)
+    assert bucket.try_acquire()
+
+
+def test_tokens_go_round_robin_across_cameras():
+    limiter = FairLimiter(rate=10, burst=1, max_wait=5)
+    assert limiter.acquire('warmup')  # Drain the burst so every later request has to queue
+    granted = []
+    lock = threading.Lock()
+
+    def request(camera_id):
+        if limiter.acquire(camera_id):
+            with lock:
+                granted.append(camera_id)
+
+    threads = [threading.Thread(target=request, args=('busy',)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=request, args=('quiet',)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    # The quiet camera queued last but gets the token right after the busy camera's first
+    assert granted == ['busy', 'quiet', 'busy', 'busy', 'busy']
+    assert limiter.stats() == {'granted': 6, 'skipped': 0, 'waiting': 0}
+
+
+def test_request_gives_up_after_max_wait():
+    limiter = FairLimiter(rate=0.01, burst=1, max_wait=0.05)
+    assert limiter.acquire('cam')
+
+    started = time.monotonic()
+    assert not limiter.acquire('cam')
+    assert time.monotonic() - started >= 0.05
+    assert limiter.stats() == {'granted': 1, 'skipped': 1, 'waiting': 0}